@@ -1,24 +1,31 @@
 # src/analyze_and_alert.py
 import os, json, re, smtplib, requests
 import pandas as pd
-import yfinance as yf
 import numpy as np
 from email.mime.text import MIMEText
 from email.utils import formatdate
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-import argparse
+import argparse, asyncio, threading
 import pytz
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 # Local imports
 from spec_schema import StrategySpec
 from signal_engine import signalize
 from feature_lab import ema, rsi, atr, quarter_grid
 from sentiment import market_sentiment
-from chart_export import export_trade_chart   # <--- NEW
+from chart_export import submit_chart
+from session_calendar import add_sessions, time_to_next_session
+from scoring import add_scores
+from event_journal import JournalWriter
+from metrics import get_metrics, NullMetrics
+from feature_store import FeatureStore, FEATURE_DIR
 def parse_args():
     parser = argparse.ArgumentParser(description="BTMM Quarters AI Signal Engine.")
     parser.add_argument("--test", action="store_true", help="Run in test mode(Force Signal)")
     parser.add_argument("--signal", choices=["BUY","SELL"], help="Forced Signal for test mode")
+    parser.add_argument("--metrics", action="store_true", help="Record stage timings/counters (or ALERT_METRICS=1)")
     return parser.parse_args()
 # ---------- ENV ----------
 load_dotenv()
@@ -31,6 +38,21 @@ SMTP_PORT      = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER      = os.getenv("SMTP_USER")
 SMTP_PASS      = os.getenv("SMTP_PASS")
 
+# ---------- OUTPUTS ----------
+# Overridable as a whole (run(out=...)) so replays don't touch the live files.
+OUT = {
+    "signals":    "outputs/signals/usdmxn_signals_with_trades.csv",
+    "bars":       "data/market/USDMXN_M15.csv",
+    "chart":      "outputs/images/usdmxn_chart.png",
+    "last_alert": "outputs/alerts/last_alert.json",
+    "journal":    "outputs/stream/events.jsonl",
+    "features":   FEATURE_DIR,
+    "metrics_log":   "outputs/metrics/alert_runs.jsonl",
+    "metrics_prom":  "outputs/metrics/alert.prom",
+    "metrics_state": "outputs/metrics/alert_state.json",
+}
+BAR = pd.Timedelta("15min")
+
 # ---------- HELPERS ----------
 def utc_now():
     return datetime.now(timezone.utc)
@@ -40,6 +62,7 @@ def fetch_usdmxn_period(interval="15m", period="7d"):
     Fetch intraday USD/MXN candles from Yahoo Finance.
     Flattens MultiIndex so downstream feature funcs work.
     """
+    import yfinance as yf   # only the live path needs it (replays inject their own fetch)
     ticker = "USDMXN=X"
     df = yf.download(ticker, interval=interval, period=period)
 
@@ -61,28 +84,6 @@ def fetch_usdmxn_period(interval="15m", period="7d"):
 
     return df
 
-def add_sessions(df):
-    """
-    Tag sessions using strict UTC hours:
-    - Asia:   00:00–06:59 UTC
-    - London: 07:00–11:59 UTC
-    - NY:     12:00–16:59 UTC
-    - Other:  all else
-    """
-    # Ensure all timestamps are in UTC
-    idx_utc = (df.index.tz_localize("UTC") if df.index.tz is None else df.index.tz_convert("UTC"))
-    hrs = idx_utc.hour
-
-    sess = pd.cut(
-        hrs,
-        bins=[-1, 6, 11, 16, 23],
-        labels=["Asia", "London", "NY", "Other"],
-        right=True
-    ).astype(str)
-
-    out = df.copy()
-    out["Session"] = sess
-    return out
 
 
 
@@ -94,21 +95,21 @@ def read_cached_spec(path="outputs/specs/usdmxn_from_ai.json"):
     with open("outputs/specs/usdmxn_quarters_bmm.json", "r", encoding="utf-8") as f:
         return StrategySpec.model_validate_json(f.read())
 
-def last_alert_path():
-    os.makedirs("outputs/alerts", exist_ok=True)
-    return "outputs/alerts/last_alert.json"
+def last_alert_path(path=None):
+    path = path or OUT["last_alert"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
 
-def already_alerted_for(timestamp_iso: str):
-    p = last_alert_path()
-    if not os.path.exists(p): return False
+def read_last_alert(path=None):
+    """Bar timestamp of the last alert sent, or None."""
     try:
-        d = json.load(open(p,"r",encoding="utf-8"))
-        return d.get("last_bar") == timestamp_iso
+        with open(last_alert_path(path), "r", encoding="utf-8") as f:
+            return json.load(f).get("last_bar")
     except Exception:
-        return False
+        return None
 
-def write_last_alert(timestamp_iso: str, payload: dict):
-    json.dump({"last_bar": timestamp_iso, "payload": payload}, open(last_alert_path(),"w",encoding="utf-8"), indent=2)
+def write_last_alert(timestamp_iso: str, payload: dict, path=None):
+    json.dump({"last_bar": timestamp_iso, "payload": payload}, open(last_alert_path(path),"w",encoding="utf-8"), indent=2)
 
 def send_email(subject: str, body: str, attachment=None):
     from email.mime.multipart import MIMEMultipart
@@ -136,61 +137,149 @@ def send_email(subject: str, body: str, attachment=None):
             s.login(SMTP_USER, SMTP_PASS)
         s.sendmail(ALERT_FROM, [ALERT_TO], msg.as_string())
 
-# Add confidence scoring
-def score_signal(r):
-    score = 0
-    if r.get("SweepLo",0)==1 or r.get("SweepHi",0)==1: score += 40
-    if r.get("QG_DistPips",99) <= 6: score += 20
-    if r.get("RSI_14",0) < 30 or r.get("RSI_14",0) > 70: score += 20
-    if (r.get("EMA_50",0) > r.get("EMA_200",0)) or (r.get("EMA_50",0) < r.get("EMA_200",0)): score += 20
-    return score
+# ---------- PIPELINE ----------
+# Seconds each stage may take before the run gives up on it (or, for the
+# chart, sends without the attachment). Overridable per run.
+STAGE_TIMEOUTS = {
+    "fetch": 60, "spec": 10, "state": 5, "features": 30, "signalize": 60, "score": 10,
+    "sentiment": 10, "chart": 5, "write": 30, "journal": 5, "send": 60,
+}
+MAX_CONCURRENCY = 4            # executor jobs in flight at once
+_pool = None
+_store_lock = threading.Lock()  # one feature-store writer, even after its stage timed out
 
-# ---------- MAIN ----------
-def main():
-    args = parse_args()
-    # 1) Data
-    df = fetch_usdmxn_period(period="7d",interval="15m")
-    df = add_sessions(df)
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="alert")
+    return _pool
+
+
+class _Stages:
+    """Runs blocking stages on the executor, under the semaphore, timed and time-boxed."""
+
+    def __init__(self, m, timeouts):
+        self.m = m
+        self.timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+        self.sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def __call__(self, name, fn, *a, **kw):
+        loop = asyncio.get_running_loop()
+        async with self.sem:
+            with self.m.span(name):
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(_executor(), partial(fn, *a, **kw)),
+                                                  self.timeouts[name])
+                except Exception:
+                    # a timed-out job keeps its thread until it returns; we just stop waiting
+                    self.m.inc("errors_total", stage=name)
+                    raise
+
+
+def _load_bars(fetch):
+    return add_sessions(fetch(period="7d", interval="15m"))
+
+
+def _load_spec(spec_path):
+    return read_cached_spec(spec_path) if spec_path else read_cached_spec()
+
+
+def _features(df, spec, root):
+    # a timed-out earlier job may still be writing the store: don't wait on it, recompute
+    if not _store_lock.acquire(blocking=False):
+        print("Feature store busy, recomputing.")
+        return None
+    try:
+        return FeatureStore(spec, "USDMXN", root=root).features_for(df)
+    finally:
+        _store_lock.release()
+
+
+def _signalize(df, spec, feats):
+    df = signalize(df, spec, features=feats)
+    if "EMA_50" not in df.columns:
+        df["EMA_50"] = ema(df["Close"], 50)
+    if "EMA_200" not in df.columns:
+        df["EMA_200"] = ema(df["Close"], 200)
+    return df
+
+
+def _write_csvs(out, df, paths):
+    out.to_csv(paths["signals"], index_label="Datetime")
+    df.to_csv(paths["bars"], index_label="Datetime")
+
+
+def _publish(journal, out, signal, payload):
+    journal.publish_bars(out, list(out.columns))
+    if signal in ("BUY","SELL"):
+        journal.publish("signal", payload)
+
+
+async def run_async(args, fetch=fetch_usdmxn_period, send=send_email, clock=utc_now, out=None, spec_path=None,
+                    metrics=None, timeouts=None):
+    """
+    One pass of the alert pipeline as overlapping stages:
+    - the spec and the last-alert state are read while the bars download
+    - features, signals and scores run on the executor (critical path)
+    - the chart renders while the body is built; CSVs and the journal are
+      written while the email goes out, and are awaited before returning
+    So bar arrival -> send costs fetch + signal (+ whatever is left of the
+    chart). Every stage is bounded by STAGE_TIMEOUTS; a late chart is
+    dropped from the email rather than delaying it.
+    """
+    out_paths = {**OUT, **(out or {})}
+    m = metrics or NullMetrics()
+    stage = _Stages(m, timeouts)
+    m.inc("runs_total")
+
+    # 1) Data, spec and previous alert state, concurrently
+    bars_t = asyncio.ensure_future(stage("fetch", _load_bars, fetch))
+    spec_t = asyncio.ensure_future(stage("spec", _load_spec, spec_path))
+    state_t = asyncio.ensure_future(stage("state", read_last_alert, out_paths["last_alert"]))
+    try:
+        df = await bars_t
+    except BaseException:
+        for t in (spec_t, state_t):
+            t.cancel()
+        raise
+    m.inc("bars_processed_total", len(df))
 
     last = df.index[-1]
     print("local time:", last.tz_convert("America/New_York"))
     print("UTC time:  ", last.tz_convert("UTC"))
     print("Session:   ", df.iloc[-1]["Session"])
-   
-    # 2) Strategy spec
+    print("Bar age:   ", clock() - last)
+
     try:
-        spec = read_cached_spec()
+        spec = await spec_t
     except Exception:
         print("Spec load failed.")
-        return
+        state_t.cancel()
+        return None
 
-    # 3) Signals
-    df = signalize(df, spec)
-    #print(df.head())
-    if "Score" not in df.columns:
-        df["Score"] = df.apply(score_signal, axis=1)
-    if "EMA_50" not in df.columns:
-        df["EMA_50"] = ema(df["Close"], 50)
-    if "EMA_200" not in df.columns:
-        df["EMA_200"] = ema(df["Close"], 200)
+    # 2) Signals (features for already-seen bars come from the store)
+    feats = None
+    try:
+        feats = await stage("features", _features, df, spec, out_paths["features"])
+    except (OSError, asyncio.TimeoutError) as e:
+        print("Feature store unavailable, recomputing:", repr(e))
+    df = await stage("signalize", _signalize, df, spec, feats)
 
     cols = ["Close", "Signal", "Session","QG", "RSI_14", "EMA_50", "EMA_200","High","Low","SweepHi","SweepLo"]
+    # Confidence score for every bar in one vectorized pass
+    df = await stage("score", add_scores, df, spec.scoring)
     valid_cols = [c for c in cols if c in df.columns]
     out = df[valid_cols].copy()
-    out['Score'] = df.apply(score_signal, axis=1)
-    out.to_csv("outputs/signals/usdmxn_signals_with_trades.csv", index_label="Datetime")
-    df.to_csv("data/market/USDMXN_M15.csv", index_label="Datetime")
-    #print(df.tail(10)[["Close","Signal","Session","Score"]])
-    #print(df.head())
+    out['Score'] = df['Score']
     if df.empty:
         print("No data after dropna; exiting.")
-        return
+        return None
 
-    # 4) Latest bar
+    # 3) Latest bar
     latest_dt = out.index[-1]
     latest = out.iloc[-1]
     score = latest.get("Score",0)
-    #body += f"\nSignal confidence score: {score}/100\n"
     session = latest.get("Session","Other")
     signal  = latest.get("Signal","FLAT")
     if args.test:
@@ -200,23 +289,39 @@ def main():
 
     if not args.test:
         if session not in ("London","NY"):
-            print(f"Session={session}, skip.")
-            
+            nxt = min((time_to_next_session(clock(), s) for s in ("London","NY")), key=lambda x: x[1])
+            print(f"Session={session}, skip. Next window: {nxt[0]} in {nxt[1]}")
         elif signal not in ("BUY","SELL"):
             print(f"Signal={signal}, skip.")
-            
 
     ts_iso = latest_dt.isoformat()
-    if already_alerted_for(ts_iso):
+    try:
+        last_alerted = await state_t
+    except Exception:
+        last_alerted = None   # unreadable state counts as not alerted
+    # test mode never records its alerts, so it isn't blocked by one either
+    already = not args.test and last_alerted == ts_iso
+    if already:
         print("Already alerted for this bar; skip.")
-        
 
-    # 5) Sentiment analysis
-    sentiment = market_sentiment(out)
-    #print("Debug Sentiment:", sentiment)
+    should_alert = (session in ("London","NY")) and (signal in ("BUY","SELL")) and not already
+    if signal in ("BUY","SELL"):
+        m.inc("signals_total", signal=signal)
+
+    # 4) Sentiment, then the chart on its worker while everything else proceeds
+    sentiment = await stage("sentiment", market_sentiment, out)
     sentiment_str = "\n".join([f"- {k}: {v}" for k,v in sentiment.items()])
-    
-    #print(sentiment_str)
+    chart_job = None
+    if should_alert:
+        chart_job = asyncio.wrap_future(
+            submit_chart(df, out_paths["chart"], price_col="Close", ema_col="EMA_50", sentiment=sentiment))
+
+    # 5) Persistence off the critical path: CSVs and the live feed
+    journal = JournalWriter(out_paths["journal"])
+    write_t = asyncio.ensure_future(stage("write", _write_csvs, out, df, out_paths))
+    journal_t = asyncio.ensure_future(stage(
+        "journal", _publish, journal, out, signal,
+        {"Datetime": ts_iso, "signal": signal, "session": session, "price": float(latest["Close"]), "score": score}))
 
     # 6) Build alert body
     price = float(latest["Close"])
@@ -238,17 +343,58 @@ def main():
     )
     subject = f"[USDMXN {spec.timeframe}] {signal} @ {price:.5f} ({session})"
 
-    # 7) Export chart with sentiment
-    chart_path = export_trade_chart(df, "outputs/images/usdmxn_chart.png", price_col="Close", ema_col="EMA_50", sentiment=sentiment)
+    # 7) Send email with the chart if it is ready within its budget
+    try:
+        if should_alert:
+            chart_path = None
+            with m.span("chart"):
+                try:
+                    chart_path = await asyncio.wait_for(chart_job, stage.timeouts["chart"])
+                except Exception as e:
+                    print("Chart not ready, sending without it:", repr(e))
+                    m.inc("errors_total", stage="chart")
+            await stage("send", send, subject, body, attachment=chart_path)
+            m.inc("alerts_total", signal=signal)
+            # bar close -> handed to SMTP; 0 if the (still forming) bar hasn't closed yet
+            m.observe("alert_latency_seconds", max(0.0, (pd.Timestamp(clock()) - (latest_dt + BAR)).total_seconds()))
+            if not args.test:
+                write_last_alert(ts_iso, {"signal": signal, "price": price, "session": session}, out_paths["last_alert"])
+            print("✅ Alert sent with sentiment + chart." if chart_path else "✅ Alert sent with sentiment.")
+        elif not already:
+            print(f"No alert window; Session = {session}, Signal = {signal}")
+    finally:
+        # 8) Let the background writes finish, even if the send failed
+        for name, t in (("write", write_t), ("journal", journal_t)):
+            try:
+                await t
+            except Exception as e:
+                print(f"{name} stage failed:", repr(e))
+    if should_alert:   # after the journal task, so the alert follows its signal
+        try:
+            journal.publish("alert", {"Datetime": ts_iso, "subject": subject})
+        except OSError as e:
+            print("Event journal write failed:", e)
+    return {"bar": latest_dt, "signal": signal, "session": session, "score": score, "alerted": should_alert}
+
+
+def run(args, fetch=fetch_usdmxn_period, send=send_email, clock=utc_now, out=None, spec_path=None,
+        metrics=None, timeouts=None):
+    """
+    Synchronous entry point for run_async. Data source, mail transport, clock
+    and output paths are injectable so the replay harness can drive it offline.
+    Stage timings and counters go to `metrics` (no-op when not given).
+    Returns a small summary of the latest bar (None if nothing was evaluated).
+    """
+    return asyncio.run(run_async(args, fetch, send, clock, out, spec_path, metrics, timeouts))
+
+def main():
+    args = parse_args()
+    metrics = get_metrics(args.metrics or None).load(OUT["metrics_state"])
+    res = run(args, metrics=metrics)
+    metrics.end_run(OUT["metrics_log"], **(res or {}))
+    metrics.write_prometheus(OUT["metrics_prom"])
+    metrics.save(OUT["metrics_state"])
 
-    # 8) Send email
-    if (session in ("London","NY")) and (signal in ("BUY","SELL")):
-        send_email(subject, body, attachment=chart_path)
-        if not args.test:
-            write_last_alert(ts_iso, {"signal": signal, "price": price, "session": session})
-        print("✅ Alert sent with sentiment + chart.")
-    else:
-        print(f"No alert window; Session = {session}, Signal = {signal}")
 if __name__ == "__main__":
     main()
     
@@ -14,6 +14,7 @@ from signal_engine import signalize
 from feature_lab import ema, rsi, atr, quarter_grid
 from sentiment import market_sentiment
 from chart_export import export_trade_chart   # <--- NEW
+from session_calendar import add_sessions
 def parse_args():
     parser = argparse.ArgumentParser(description="BTMM Quarters AI Signal Engine.")
     parser.add_argument("--test", action="store_true", help="Run in test mode(Force Signal)")
@@ -72,28 +73,6 @@ def fetch_usdmxn_period(interval="15min", outputsize="compact"):
 
     print("Data covers:", df.index.min(), "→", df.index.max())
     return df
-def add_sessions(df):
-    """
-    Tag sessions using strict UTC hours:
-    - Asia:   00:00–06:59 UTC
-    - London: 07:00–11:59 UTC
-    - NY:     12:00–16:59 UTC
-    - Other:  all else
-    """
-    # Ensure all timestamps are in UTC
-    idx_utc = (df.index.tz_localize("UTC") if df.index.tz is None else df.index.tz_convert("UTC"))
-    hrs = idx_utc.hour
-
-    sess = pd.cut(
-        hrs,
-        bins=[-1, 6, 11, 16, 23],
-        labels=["Asia", "London", "NY", "Other"],
-        right=True
-    ).astype(str)
-
-    out = df.copy()
-    out["Session"] = sess
-    return out
 
 
 
@@ -3,25 +3,62 @@ import pandas as pd, json
 from spec_schema import StrategySpec
 from signal_engine import signalize
 from backtest_utils import equity_with_trades, kpis  # assume you have this
+from scoring import add_scores, filter_by_score
+from session_calendar import add_sessions   # DST-aware, shared with the alert scripts
+from feature_store import FeatureStore, columns_for
 
 # ---- Load Bars ----
 def load_bars(path):
     df = pd.read_csv(path, parse_dates=["Datetime"]).set_index("Datetime").sort_index()
     return df[["Open","High","Low","Close","Volume"]]
 
-# ---- Add Session Column ----
-def add_sessions(df):
+# ---- One spec end to end ----
+def exit_params(spec: StrategySpec):
+    """(tp_rr, sl_atr_mult) from the spec's TP_SL exit, defaulting to 2.0 / 1.5."""
+    for ex in spec.exits:
+        if ex.type == "TP_SL":
+            return float(ex.params.get("tp_rr", 2.0)), float(ex.params.get("sl_atr_mult", 1.5))
+    return 2.0, 1.5
+
+def entry_signals(df, spec: StrategySpec, features=None):
+    """Signals and scores, with entries scoring below the spec's min_score turned FLAT."""
+    df = signalize(df, spec, features=features)
+    rule = spec.scoring
+    df = add_scores(df, rule)
+    if rule is not None:
+        df = filter_by_score(df, rule.min_score)
+    return df
+
+def simulate(df, spec: StrategySpec, features=None, state=None):
     """
-    Adds a 'Session' column (Asia, London, NY, Other) based on hour.
-    Adjust bins to match your broker's timezone (assuming UTC here).
+    Signals, scores and simulated trades for one spec on session-tagged bars.
+    `features` (e.g. from a FeatureStore) skips recomputing the indicators;
+    `state` carries the open position between blocks (see equity_with_trades).
     """
-    hrs = df.index.hour
-    df["Session"] = pd.cut(
-        hrs,
-        bins=[-1, 6, 11, 16, 23],   # 0–6 Asia, 7–11 London, 12–16 NY, 17–23 Other
-        labels=["Asia", "London", "NY", "Other"]
-    ).astype(str)
-    return df
+    df = entry_signals(df, spec, features=features)
+    tp_rr, sl_atr_mult = exit_params(spec)
+    return equity_with_trades(df, atr_col="ATR_14", tp_rr=tp_rr, sl_atr_mult=sl_atr_mult, state=state)
+
+def run_backtest(df, spec: StrategySpec, features=None):
+    """simulate() plus KPIs, with the whole history in memory."""
+    df = simulate(df, spec, features=features)
+    return df, kpis(df["Equity"])
+
+# ---- Worker-process helpers (bars are loaded once per worker) ----
+_WORKER_BARS = None
+
+def init_worker(bars_path):
+    global _WORKER_BARS
+    _WORKER_BARS = add_sessions(load_bars(bars_path))
+
+def backtest_spec_json(spec_json):
+    """KPIs for a spec given as JSON, or None if the spec can't be evaluated on these bars."""
+    try:
+        spec = StrategySpec.model_validate_json(spec_json)
+        return run_backtest(_WORKER_BARS.copy(), spec)[1]
+    except Exception as e:
+        print(f"Backtest failed: {e}")
+        return None
 
 # ---- Main Run ----
 if __name__ == "__main__":
@@ -34,11 +71,13 @@ if __name__ == "__main__":
     df = load_bars("data/market/USDMXN_M15.csv")
     df = add_sessions(df)
 
-    # Generate signals
-    df = signalize(df, spec)
+    # Features come from the on-disk store: only bars newer than the last run are computed
+    store = FeatureStore(spec, "USDMXN")
+    print(f"Feature store: {store.update(df)} rows computed ({store.dir})")
+    feats = store.frame(columns_for(spec), start=df.index[0], end=df.index[-1])
 
-    # Run backtest with trades annotated
-    df = equity_with_trades(df, atr_col="ATR_14", tp_rr=2.0, sl_atr_mult=1.5)
+    # Generate signals and run backtest with trades annotated
+    df, _ = run_backtest(df, spec, features=feats)
 
     # Save outputs
     df.to_csv("outputs/signals/usdmxn_signals_with_trades.csv")
@@ -2,15 +2,20 @@
 import pandas as pd
 import numpy as np
 
-def equity_with_trades(df, atr_col="ATR_14", tp_rr=2.0, sl_atr_mult=1.5, init_equity=10000):
+BARS_PER_YEAR = 252*24*4   # ~15-min bars
+
+def equity_with_trades(df, atr_col="ATR_14", tp_rr=2.0, sl_atr_mult=1.5, init_equity=10000, state=None):
     """
     Simulates equity curve with simple fixed fraction risk model.
     df must already have 'Signal' column from signal_engine.
     Returns df with 'Equity' and 'TradeAction'.
+    state: optional dict carrying equity and the open position from a call on
+    the preceding bars; updated in place, so history can be run in blocks.
     """
-    eq = init_equity
-    in_trade = False
-    trade_side, entry_price, sl, tp = None, None, None, None
+    st = state if state is not None else {}
+    eq = st.get("equity", init_equity)
+    in_trade = st.get("in_trade", False)
+    trade_side, entry_price, sl, tp = st.get("side"), st.get("entry"), st.get("sl"), st.get("tp")
     actions, equities = [], []
 
     for i, row in df.iterrows():
@@ -39,14 +44,14 @@ def equity_with_trades(df, atr_col="ATR_14", tp_rr=2.0, sl_atr_mult=1.5, init_eq
                     eq *= (1 - 0.01)  # lose 1%
                     in_trade, action = False, "EXIT-SL"
                 elif row["High"] >= tp:  # hit TP
-                    eq *= (1 + 0.02)  # win 2% (RR=2)
+                    eq *= (1 + 0.01 * tp_rr)  # win tp_rr x the 1% risked
                     in_trade, action = False, "EXIT-TP"
             elif trade_side == "SHORT":
                 if row["High"] >= sl:
                     eq *= (1 - 0.01)
                     in_trade, action = False, "EXIT-SL"
                 elif row["Low"] <= tp:
-                    eq *= (1 + 0.02)
+                    eq *= (1 + 0.01 * tp_rr)
                     in_trade, action = False, "EXIT-TP"
 
         actions.append(action)
@@ -54,6 +59,7 @@ def equity_with_trades(df, atr_col="ATR_14", tp_rr=2.0, sl_atr_mult=1.5, init_eq
 
     df["TradeAction"] = actions
     df["Equity"] = equities
+    st.update(equity=eq, in_trade=in_trade, side=trade_side, entry=entry_price, sl=sl, tp=tp)
     return df
 
 
@@ -64,5 +70,51 @@ def kpis(equity: pd.Series):
     ret = equity.iloc[-1] / equity.iloc[0] - 1
     dd = (equity / equity.cummax() - 1).min()
     rets = equity.pct_change().dropna()
-    sharpe = np.mean(rets) / (np.std(rets) + 1e-9) * np.sqrt(252*24*4)  # ~15-min bars
+    sharpe = np.mean(rets) / (np.std(rets) + 1e-9) * np.sqrt(BARS_PER_YEAR)
     return {"TotalReturn": ret, "Sharpe-ish": sharpe, "MaxDD": dd}
+
+
+class StreamingKPIs:
+    """
+    kpis() over an equity curve fed in pieces (update per block), in O(1)
+    memory: running peak for the drawdown and a Welford/Chan merge of the
+    per-block mean and variance of bar returns.
+    """
+
+    def __init__(self):
+        self.first = self.last = None
+        self.peak = -np.inf
+        self.dd = np.inf
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def update(self, equity):
+        eq = np.asarray(equity, dtype=float)
+        if not len(eq):
+            return self
+        if self.first is None:
+            self.first = eq[0]
+        prev = eq if self.last is None else np.r_[self.last, eq]
+        rets = prev[1:] / prev[:-1] - 1
+        rets = rets[~np.isnan(rets)]
+        if len(rets):
+            nb, mb = len(rets), rets.mean()
+            m2b = ((rets - mb) ** 2).sum()
+            n = self.n + nb
+            d = mb - self.mean
+            self.mean += d * nb / n
+            self.m2 += m2b + d * d * self.n * nb / n
+            self.n = n
+        peak = np.maximum.accumulate(np.r_[self.peak, eq])[1:]
+        self.peak = peak[-1]
+        self.dd = min(self.dd, (eq / peak - 1).min())
+        self.last = eq[-1]
+        return self
+
+    def result(self):
+        if self.first is None:
+            return {"TotalReturn": np.nan, "Sharpe-ish": np.nan, "MaxDD": np.nan}
+        mean = self.mean if self.n else np.nan
+        std = np.sqrt(self.m2 / self.n) if self.n else np.nan
+        return {"TotalReturn": self.last / self.first - 1,
+                "Sharpe-ish": mean / (std + 1e-9) * np.sqrt(BARS_PER_YEAR),
+                "MaxDD": self.dd}
@@ -0,0 +1,200 @@
+# src/bench.py
+"""
+Scaling benchmark for the signal/backtest hot paths on synthetic bars.
+Fully offline. Records wall time, peak traced memory and bars/s per stage
+and size, and compares against a stored baseline.
+
+    python src/bench.py                          # 10k, 100k, 1M bars; compare to baseline
+    python src/bench.py --sizes 10000 100000 --stages signalize kpis
+    python src/bench.py --update-baseline        # accept the current numbers
+
+Exit code is 1 when any stage regressed by more than --tolerance.
+"""
+import os, sys, json, time, argparse, platform, tempfile, tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from spec_schema import StrategySpec
+from feature_lab import rsi, atr, ema, quarter_grid, sweep_flags
+from signal_engine import add_features, signalize
+from session_calendar import add_sessions
+from backtest_utils import equity_with_trades, kpis
+from sentiment import sentiment_series, market_sentiment
+from chart_export import export_trade_chart
+
+SPEC_PATH     = "outputs/specs/usdmxn_quarters_bmm.json"
+BASELINE_PATH = "outputs/bench/baseline.json"
+LATEST_PATH   = "outputs/bench/latest.json"
+SIZES         = [10_000, 100_000, 1_000_000]
+MIN_WALL_S    = 0.02    # below this, timing noise dominates; don't flag
+
+
+def synthetic_bars(n, seed=0):
+    """Random-walk M15 USDMXN-like OHLCV with sessions, deterministic per (n, seed)."""
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2000-01-03", periods=n, freq="15min", tz="UTC", name="Datetime")
+    close = 18.0 * np.exp(np.cumsum(rng.normal(0, 0.0006, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    wick = np.abs(rng.normal(0, 0.004, (2, n)))
+    df = pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + wick[0],
+        "Low": np.minimum(open_, close) - wick[1],
+        "Close": close,
+        "Volume": rng.integers(100, 1000, n),
+    }, index=idx)
+    return add_sessions(df)
+
+
+def _indicators(df):
+    out = df.copy()
+    out["RSI_14"] = rsi(out["Close"], 14)
+    out["ATR_14"] = atr(out, 14)
+    out["EMA_50"] = ema(out["Close"], 50)
+    out["QG"] = quarter_grid(out["Close"])
+    return sweep_flags(out)
+
+
+def _sentiment(df):
+    ser = sentiment_series(df)
+    return market_sentiment(df, series=ser)
+
+
+class Frames:
+    """Per-size inputs; downstream stages reuse upstream results (computed untimed if skipped)."""
+
+    def __init__(self, n, spec, chart_dir):
+        self.bars = synthetic_bars(n)
+        self.spec = spec
+        self.chart_path = os.path.join(chart_dir, f"bench_{n}.png")
+        self.results = {}
+
+    def get(self, stage):
+        if stage not in self.results:
+            self.results[stage] = STAGES[stage](self)
+        return self.results[stage]
+
+
+STAGES = {
+    "indicators":         lambda f: _indicators(f.bars),
+    "add_features":       lambda f: add_features(f.bars, f.spec),
+    "signalize":          lambda f: signalize(f.bars.copy(), f.spec),
+    "equity_with_trades": lambda f: equity_with_trades(f.get("signalize").copy(), atr_col="ATR_14"),
+    "kpis":               lambda f: kpis(f.get("equity_with_trades")["Equity"]),
+    "market_sentiment":   lambda f: _sentiment(f.get("add_features")),
+    "export_trade_chart": lambda f: export_trade_chart(f.get("equity_with_trades"), f.chart_path, bars=None),
+}
+DEPS = {
+    "equity_with_trades": ["signalize"],
+    "kpis":               ["equity_with_trades"],
+    "market_sentiment":   ["add_features"],
+    "export_trade_chart": ["equity_with_trades"],
+}
+
+
+def measure(fn, repeat=1, memory=True):
+    """Best wall time over `repeat` untraced runs, plus peak traced MB from one extra run."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def run(sizes=SIZES, stages=tuple(STAGES), repeat=1, memory=True, spec_path=SPEC_PATH):
+    with open(spec_path, encoding="utf-8") as f:
+        spec = StrategySpec.model_validate_json(f.read())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            frames = Frames(n, spec, tmp)
+            for stage in stages:
+                for dep in DEPS.get(stage, ()):
+                    frames.get(dep)     # upstream inputs, untimed
+                wall, peak, out = measure(lambda: STAGES[stage](frames), repeat, memory)
+                frames.results.setdefault(stage, out)
+                row = {"n": n, "wall_s": round(wall, 4),
+                       "peak_mb": None if peak is None else round(peak, 1),
+                       "bars_per_s": round(n / wall, 1)}
+                results[f"{stage}@{n}"] = row
+                print(f"{stage:>20} {n:>9,} bars  {wall:9.3f} s  {n / wall:14,.0f} bars/s"
+                      + ("" if peak is None else f"  peak {peak:8.1f} MB"))
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """[(key, metric, base, now, ratio)] for every metric worse than baseline * (1 + tolerance)."""
+    regressions = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if now["wall_s"] >= MIN_WALL_S and now["wall_s"] > base["wall_s"] * (1 + tolerance):
+            regressions.append((key, "wall_s", base["wall_s"], now["wall_s"], now["wall_s"] / base["wall_s"]))
+        if now.get("peak_mb") and base.get("peak_mb") and now["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+            regressions.append((key, "peak_mb", base["peak_mb"], now["peak_mb"], now["peak_mb"] / base["peak_mb"]))
+    return regressions
+
+
+def write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Signal/backtest scaling benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    ap.add_argument("--repeat", type=int, default=1, help="Timed runs per stage (best is kept)")
+    ap.add_argument("--no-mem", action="store_true", help="Skip the tracemalloc pass")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--out", default=LATEST_PATH)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/growth before flagging")
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+
+    results = run(args.sizes, args.stages, args.repeat, not args.no_mem)
+    payload = {"env": environment(), "results": results}
+    write_json(args.out, payload)
+    print(f"Wrote {args.out}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                old = json.load(f)["results"]
+            payload["results"] = {**old, **results}   # partial runs only replace what they measured
+        write_json(args.baseline, payload)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if baseline.get("env", {}).get("machine") != payload["env"]["machine"]:
+        print("Note: baseline was recorded on a different machine type.")
+    for key, metric, base, now, ratio in regressions:
+        print(f"REGRESSION {key} {metric}: {base} -> {now} ({ratio:.2f}x)")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions vs {args.baseline} (tolerance {args.tolerance:.0%}).")
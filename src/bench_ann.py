@@ -0,0 +1,110 @@
+# src/bench_ann.py
+"""
+Recall/latency/size benchmark of the KB index types on a synthetic corpus.
+
+    python src/bench_ann.py                 # 1M x 384 vectors (needs ~3 GB RAM)
+    python src/bench_ann.py --n 100000 --types flat ivf hnsw pq
+"""
+import os, json, time, argparse, ctypes
+import faiss, numpy as np
+from kb_index import INDEX_TYPES, resolve_params, build_index
+
+
+def synthetic_corpus(n, d=384, clusters=1000, seed=7, block=100_000):
+    """Unit vectors drawn around random cluster centres (text embeddings are clustered, not uniform)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, d)).astype("float32")
+    out = np.empty((n, d), dtype="float32")
+    for s in range(0, n, block):
+        e = min(s + block, n)
+        out[s:e] = centres[rng.integers(0, clusters, e - s)] + 0.6 * rng.standard_normal((e - s, d)).astype("float32")
+    faiss.normalize_L2(out)
+    return out
+
+
+def recall_at_k(truth, found):
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)]))
+
+
+def rss_bytes():
+    """
+    Resident set size of this process from /proc (None where that isn't
+    available). Free heap pages are handed back first (glibc), so memory
+    freed by an earlier index can't hide the next one's growth.
+    """
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def bench(kind, vecs, queries, truth, k, **overrides):
+    p = resolve_params(kind, len(vecs), vecs.shape[1], **overrides)
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    index = build_index(vecs, np.arange(len(vecs), dtype=np.int64), p)
+    build_s = time.perf_counter() - t0
+    rss1 = rss_bytes()   # RSS growth over the build: graph links, list overallocation etc. included
+
+    index.search(queries[:10], k)   # warm up
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q[None, :], k)
+        lat.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    _, I = index.search(queries, k)
+    batch_s = time.perf_counter() - t
+
+    disk = len(faiss.serialize_index(index))
+    return {
+        "params": p,
+        "build_s": round(build_s, 3),
+        f"recall@{k}": round(recall_at_k(truth, I), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(lat, 99)) * 1000, 3),
+        "batch_qps": round(len(queries) / batch_s, 1),
+        "disk_mb": round(disk / 2**20, 2),
+        "mem_mb": round((rss1 - rss0) / 2**20, 2) if rss0 is not None else None,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ANN index recall/latency benchmark")
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--d", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=list(INDEX_TYPES))
+    ap.add_argument("--nprobe", type=int)
+    ap.add_argument("--ef-search", type=int)
+    ap.add_argument("--out", default="outputs/bench/ann.json")
+    args = ap.parse_args()
+
+    print(f"Generating {args.n:,} x {args.d} corpus...")
+    vecs = synthetic_corpus(args.n, args.d)
+    rng = np.random.default_rng(11)
+    queries = vecs[rng.choice(args.n, args.queries, replace=False)] + 0.05 * rng.standard_normal((args.queries, args.d)).astype("float32")
+    faiss.normalize_L2(queries)
+
+    # ground truth from the exact index
+    exact = faiss.IndexFlatIP(args.d); exact.add(vecs)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    results = {}
+    for kind in args.types:
+        print(f"-- {kind}")
+        results[kind] = bench(kind, vecs, queries, truth, args.k, nprobe=args.nprobe, efSearch=args.ef_search)
+        print(json.dumps(results[kind]))
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"n": args.n, "d": args.d, "k": args.k, "queries": args.queries, "results": results}, f, indent=2)
+    print(f"Wrote {args.out}")
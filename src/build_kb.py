@@ -1,17 +1,261 @@
-import json, faiss, numpy as np
+# src/build_kb.py
+import os, json, time, hashlib, argparse
+import faiss, numpy as np
 from sentence_transformers import SentenceTransformer
 from pathlib import Path
+from meta_store import MetaStore
+from dedup import dedup_text, dedup_embeddings, match_existing, report
+from kb_index import INDEX_TYPES, resolve_params, build_index, apply_search_params, load_params, save_params, same_build
+
+CHUNKS_DIR = Path("kb/chunks")
+VEC_DIR    = Path("kb/vectors")
+INDEX_PATH = VEC_DIR / "trading.faiss"
+META_PATH  = VEC_DIR / "meta.jsonl"        # human-readable copy of the metadata
+STORE_PATH = VEC_DIR / "meta.sqlite"       # id-indexed store the retriever reads
+CACHE_VECS = VEC_DIR / "emb_cache.f32"        # raw float32 rows, memory-mapped
+CACHE_KEYS = VEC_DIR / "emb_cache_keys.npy"   # int64 chunk id per row
+CACHE_INFO = VEC_DIR / "emb_cache.json"       # model name + dim
+DEDUP_PATH = VEC_DIR / "dedup.npz"            # per-chunk simhash + duplicate decision
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def chunk_id(source, text):
+    """Stable 63-bit id from the chunk content (usable as a FAISS id)."""
+    h = hashlib.sha1(f"{source}\0{text}".encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "little") & 0x7FFFFFFFFFFFFFFF
+
+
+def load_chunks(chunks_dir=CHUNKS_DIR):
+    """All chunk rows with their content id; identical chunks collapse to one."""
+    rows = {}
+    for jf in sorted(Path(chunks_dir).glob("*.jsonl")):
+        with open(jf, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if not row.get("text"):
+                    continue
+                row["id"] = chunk_id(row.get("source", ""), row["text"])
+                rows.setdefault(row["id"], row)
+    return list(rows.values())
+
+
+def atomic_write(path, write_fn, mode="w"):
+    """Write through a temp file and rename, so readers never see a partial file."""
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, mode, **({"encoding": "utf-8"} if "b" not in mode else {})) as f:
+        write_fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class EmbeddingCache:
+    """
+    Persistent content-hash -> embedding cache. Vectors live in a flat float32
+    file that is opened with np.memmap, so lookups don't load the whole cache.
+    """
+
+    def __init__(self, model_name=MODEL_NAME):
+        self.model_name = model_name
+        self.dim = None
+        self.keys = np.empty(0, dtype=np.int64)
+        if CACHE_INFO.exists() and CACHE_KEYS.exists():
+            info = json.loads(CACHE_INFO.read_text())
+            if info.get("model") == model_name:
+                self.dim = info["dim"]
+                self.keys = np.load(CACHE_KEYS)
+        self._pos = {int(k): i for i, k in enumerate(self.keys)}
+
+    def vectors(self):
+        if not len(self.keys):
+            return np.empty((0, self.dim or 0), dtype="float32")
+        return np.memmap(CACHE_VECS, dtype="float32", mode="r", shape=(len(self.keys), self.dim))
+
+    def missing(self, ids):
+        return [i for i in ids if i not in self._pos]
+
+    def get(self, ids):
+        vecs = self.vectors()
+        return np.asarray(vecs[[self._pos[i] for i in ids]], dtype="float32")
+
+    def append(self, ids, vecs):
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+            CACHE_INFO.write_text(json.dumps({"model": self.model_name, "dim": self.dim}))
+            CACHE_VECS.write_bytes(b"")
+        with open(CACHE_VECS, "r+b") as f:
+            f.truncate(len(self.keys) * self.dim * 4)   # drop rows from an interrupted run
+            f.seek(0, os.SEEK_END)
+            f.write(vecs.tobytes())
+        self.keys = np.concatenate([self.keys, np.asarray(ids, dtype=np.int64)])
+        atomic_write(CACHE_KEYS, lambda f: np.save(f, self.keys), mode="wb")
+        for i in ids:
+            self._pos[i] = len(self._pos)
+
+
+def embed_missing(rows, cache, batch_size=256):
+    """Embed only chunks whose content hash is not cached yet, in batches."""
+    todo = cache.missing([r["id"] for r in rows])
+    if not todo:
+        return 0
+    by_id = {r["id"]: r for r in rows}
+    model = SentenceTransformer(cache.model_name)
+    for s in range(0, len(todo), batch_size):
+        ids = todo[s:s + batch_size]
+        embs = model.encode([by_id[i]["text"] for i in ids], normalize_embeddings=True, batch_size=64)
+        cache.append(ids, embs)
+        print(f"  embedded {min(s + batch_size, len(todo))}/{len(todo)}")
+    return len(todo)
+
+
+# how a chunk was decided in dedup.npz
+KEPT, BY_SIMHASH, BY_COSINE = 0, 1, 2
+
+
+def load_dedup(settings):
+    """{id: (simhash, dup_of, how)} from the last build, if it ran with the same settings."""
+    if not DEDUP_PATH.exists():
+        return {}
+    z = np.load(DEDUP_PATH)
+    if json.loads(str(z["settings"])) != settings:
+        return {}
+    return {int(i): (int(h), int(d), int(w)) for i, h, d, w in zip(z["ids"], z["simhash"], z["dup_of"], z["how"])}
+
+
+def save_dedup(settings, decisions):
+    ids = list(decisions)
+    cols = list(zip(*decisions.values())) or [(), (), ()]
+    atomic_write(DEDUP_PATH, lambda f: np.savez(
+        f, settings=np.array(json.dumps(settings)), ids=np.array(ids, dtype=np.int64),
+        simhash=np.array(cols[0], dtype=np.uint64), dup_of=np.array(cols[1], dtype=np.int64),
+        how=np.array(cols[2], dtype=np.int8)), mode="wb")
+
+
+def anchor_index(ids, cache):
+    """
+    Index of the already kept chunks that new ones are checked against: the
+    built index when it stores exact vectors (flat/ivf), else a flat one from the cache.
+    """
+    prev = load_params(INDEX_PATH)
+    if INDEX_PATH.exists() and prev.get("type") in ("flat", "ivf"):
+        index = faiss.read_index(str(INDEX_PATH))
+        if isinstance(index, faiss.IndexIDMap2) and index.d == cache.dim:
+            return apply_search_params(index, prev)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(cache.dim))
+    index.add_with_ids(cache.get(ids), np.asarray(ids, dtype=np.int64))
+    return index
+
+
+def dedup_chunks(rows, cache, max_hamming=3, cosine=0.95, full=False):
+    """
+    Incremental near-duplicate removal. Decisions from the last build are kept
+    (a dropped chunk is re-checked only if the chunk it duplicated is gone), so
+    only unseen chunks are SimHashed and embedded, and they are range-searched
+    against the kept ones instead of re-deduping the whole corpus.
+    Returns (kept_rows, n_text, n_emb, n_embedded, settings, decisions).
+    """
+    settings = {"model": cache.model_name, "max_hamming": max_hamming, "cosine": cosine}
+    prev = {} if full else load_dedup(settings)
+    present = {r["id"] for r in rows}
+    kept_before = {i for i, (_, dup, _) in prev.items() if dup < 0 and i in present}
+    decisions = {i: v for i, v in prev.items() if i in present and (v[1] < 0 or v[1] in kept_before)}
+    old = [r for r in rows if r["id"] in kept_before]
+    for r in old:
+        r["simhash"] = decisions[r["id"]][0]
+    new = [r for r in rows if r["id"] not in decisions]
+
+    fresh, _ = dedup_text(new, max_hamming, seen=old)
+    for r in new:
+        if "dup_of" in r:
+            decisions[r["id"]] = (r.pop("simhash"), r.pop("dup_of"), BY_SIMHASH)
+    n_embedded = embed_missing(fresh, cache)
+    if fresh:
+        vecs = cache.get([r["id"] for r in fresh])
+        dup = np.full(len(fresh), -1, dtype=np.int64)
+        if old:
+            dup = match_existing(vecs, anchor_index([r["id"] for r in old], cache), cosine, allowed=kept_before)
+        rest = np.flatnonzero(dup < 0)
+        within = dedup_embeddings(vecs[rest], cosine)
+        ids = np.array([r["id"] for r in fresh], dtype=np.int64)
+        dup[rest] = np.where(within < 0, -1, ids[rest][within])
+        for r, d in zip(fresh, dup):
+            decisions[r["id"]] = (r["simhash"], int(d), KEPT if d < 0 else BY_COSINE)
+
+    how = [decisions[r["id"]][2] for r in rows]
+    kept = [r for r, w in zip(rows, how) if w == KEPT]
+    return kept, how.count(BY_SIMHASH), how.count(BY_COSINE), n_embedded, settings, decisions
+
+
+def update_index(rows, cache, params, full=False):
+    """
+    Add new ids / remove dropped ids on the existing ID-mapped index. The index
+    is rebuilt from the cache (no re-embedding) when it is legacy, when the
+    requested type/build params changed, or when HNSW would need a removal.
+    """
+    ids = np.array([r["id"] for r in rows], dtype=np.int64)
+    index = None
+    if INDEX_PATH.exists() and not full:
+        index = faiss.read_index(str(INDEX_PATH))
+        if (not isinstance(index, faiss.IndexIDMap2) or index.d != cache.dim
+                or not same_build(load_params(INDEX_PATH), params)):
+            index = None
+
+    if index is not None:
+        have = faiss.vector_to_array(index.id_map) if index.ntotal else np.empty(0, dtype=np.int64)
+        removed = np.setdiff1d(have, ids)
+        added = np.setdiff1d(ids, have)
+        if len(removed) and params["type"] == "hnsw":
+            index = None   # HNSW can't delete
+        else:
+            if len(removed):
+                index.remove_ids(removed)
+            if len(added):
+                index.add_with_ids(cache.get(added.tolist()), added)
+            return apply_search_params(index, params), len(added), len(removed)
+
+    return build_index(cache.get(ids.tolist()), ids, params), len(ids), 0
+
 
 if __name__ == "__main__":
-    texts, meta = [], []
-    for jf in Path("kb/chunks").glob("*.jsonl"):
-        for line in open(jf, encoding="utf-8"):
-            row = json.loads(line); texts.append(row["text"]); meta.append(row)
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embs = model.encode(texts, normalize_embeddings=True)
-    index = faiss.IndexFlatIP(embs.shape[1]); index.add(np.array(embs, dtype="float32"))
-    faiss.write_index(index, "kb/vectors/trading.faiss")
-    with open("kb/vectors/meta.jsonl","w",encoding="utf-8") as f:
-        for m in meta: f.write(json.dumps(m)+"\n")
-    print(f"Indexed {len(texts)} chunks")
-    print("Done")
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Incrementally (re)build the KB vector index.")
+    ap.add_argument("--full", action="store_true", help="Rebuild the index and dedup decisions from the cache")
+    ap.add_argument("--index", choices=list(INDEX_TYPES), default=None,
+                    help="Index type (default: keep the current one, else flat)")
+    ap.add_argument("--nlist", type=int); ap.add_argument("--nprobe", type=int)
+    ap.add_argument("--M", type=int); ap.add_argument("--ef-search", type=int)
+    ap.add_argument("--pq-m", type=int); ap.add_argument("--pq-nbits", type=int)
+    ap.add_argument("--no-dedup", action="store_true", help="Index near-duplicate chunks too")
+    ap.add_argument("--max-hamming", type=int, default=3, help="SimHash bit distance counted as duplicate (0-15)")
+    ap.add_argument("--cosine", type=float, default=0.95, help="Embedding similarity counted as duplicate")
+    args = ap.parse_args()
+    if not 0 <= args.max_hamming <= 15:
+        ap.error("--max-hamming must be in 0..15")
+
+    t0 = time.perf_counter()
+    VEC_DIR.mkdir(parents=True, exist_ok=True)
+    rows = load_chunks()
+    n_in, bytes_in = len(rows), sum(len(r["text"]) for r in rows)
+    cache = EmbeddingCache()
+    if args.no_dedup:
+        n_new = embed_missing(rows, cache)
+    else:
+        rows, n_text, n_emb, n_new, dedup_settings, decisions = dedup_chunks(
+            rows, cache, args.max_hamming, args.cosine, full=args.full)
+        print("Dedup:", json.dumps(report(n_in, n_text, n_emb, cache.dim, bytes_in, sum(len(r["text"]) for r in rows))))
+    prev = load_params(INDEX_PATH)
+    kind = args.index or prev.get("type", "flat")
+    carry = {k: v for k, v in prev.items() if k != "type"} if kind == prev.get("type") else {}
+    cli = dict(nlist=args.nlist, nprobe=args.nprobe, M=args.M, efSearch=args.ef_search, m=args.pq_m, nbits=args.pq_nbits)
+    params = resolve_params(kind, len(rows), cache.dim, **{**carry, **{k: v for k, v in cli.items() if v is not None}})
+    index, n_add, n_del = update_index(rows, cache, params, full=args.full)
+
+    MetaStore(STORE_PATH).sync(rows)   # before the index, so new ids resolve as soon as they are searchable
+    atomic_write(INDEX_PATH, lambda f: f.write(faiss.serialize_index(index).tobytes()), mode="wb")
+    save_params(INDEX_PATH, params)
+    if not args.no_dedup:
+        save_dedup(dedup_settings, decisions)   # after the index: kept ids are always in it
+    atomic_write(META_PATH, lambda f: f.writelines(json.dumps(m) + "\n" for m in rows))
+    print(f"Indexed {index.ntotal} chunks into a {kind} index (+{n_add} / -{n_del}, {n_new} newly embedded) "
+          f"in {time.perf_counter() - t0:.1f}s")
+    print("Done")
@@ -1,77 +1,175 @@
 # src/chart_export.py
-import os
-import matplotlib.pyplot as plt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Patch
+from downsample import downsample
+
+SESSION_COLORS = {"London": "yellow", "NY": "lightblue"}
+MARKERS = {
+    "BUY":     dict(marker="^", c="green",  s=60),
+    "SELL":    dict(marker="v", c="red",    s=60),
+    "EXIT-TP": dict(marker="o", c="blue",   s=40),
+    "EXIT-SL": dict(marker="x", c="orange", s=60),
+}
+
+
+def _to_num(index):
+    """Vectorized DatetimeIndex -> matplotlib date numbers (UTC for tz-aware)."""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return mdates.date2num(index.values)
+
+
+def session_spans(sessions, times):
+    """
+    Run-length encode a session column and return {session: [(x0, x1), ...]}
+    for London/NY runs. x1 is the last bar of the run, as before.
+    """
+    s = np.asarray(sessions, dtype=str)
+    if len(s) == 0:
+        return {k: [] for k in SESSION_COLORS}
+    cuts = np.flatnonzero(s[1:] != s[:-1]) + 1
+    starts = np.r_[0, cuts]
+    ends = np.r_[cuts, len(s)] - 1
+    vals = s[starts]
+    return {k: list(zip(times[starts[vals == k]], times[ends[vals == k]]))
+            for k in SESSION_COLORS}
+
+
+class ChartRenderer:
+    """
+    Keeps one prebuilt figure (axes, lines, scatters, session shading, legend)
+    and only swaps the data in on each render. Not thread-safe by itself;
+    calls are serialized through a lock so a single worker can own it.
+    """
+
+    def __init__(self, figsize=(12, 6), dpi=100):
+        self.dpi = dpi
+        self.width_px = int(figsize[0] * dpi)
+        self._lock = threading.Lock()
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot(111)
+
+        self.price_line, = ax.plot([], [], color="black", linewidth=1.2, label="Close")
+        self.ema_line,   = ax.plot([], [], color="blue",  linewidth=1.0, label="EMA_50")
+        self.scatters = {k: ax.scatter([], [], label=k, zorder=3, **kw) for k, kw in MARKERS.items()}
+        self.spans = {}
+        for k, color in SESSION_COLORS.items():
+            coll = PolyCollection([], facecolors=color, alpha=0.2, zorder=0,
+                                  transform=ax.get_xaxis_transform())
+            ax.add_collection(coll)
+            self.spans[k] = coll
+        self.sentiment_text = ax.text(1.01, 0.5, "", transform=ax.transAxes, fontsize=9,
+                                      verticalalignment="center", visible=False,
+                                      bbox=dict(facecolor="white", alpha=0.8, edgecolor="gray"))
+
+        handles = [self.price_line, self.ema_line, *self.scatters.values(),
+                   *[Patch(facecolor=c, alpha=0.2, label=k) for k, c in SESSION_COLORS.items()]]
+        self.legend = ax.legend(handles=handles, loc="upper left", fontsize=8)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%m-%d\n%H:%M"))
+        ax.grid(True, alpha=0.3)
+        self.fig.subplots_adjust(left=0.07, right=0.97, top=0.94, bottom=0.1)
+
+    def render(self, df, fname, price_col="Close", ema_col="EMA_50", sentiment=None, title=None):
+        """Draw all of df, downsampled to the figure's pixel width (trade markers always kept)."""
+        if df.empty or price_col not in df.columns:
+            raise ValueError("DataFrame empty or missing price column for chart export.")
+        df_last = downsample(df, self.width_px, price_col)
+
+        with self._lock:
+            x = _to_num(df_last.index)
+            price = df_last[price_col].to_numpy(dtype=float)
+            self.price_line.set_data(x, price)
+            # the legend was built once from the handles: relabel its first two entries in place
+            price_txt, ema_txt = self.legend.get_texts()[:2]
+            price_txt.set_text(price_col)
+            ema_txt.set_text(ema_col)
+
+            has_ema = ema_col in df_last.columns
+            self.ema_line.set_visible(has_ema)
+            self.ema_line.set_data(x, df_last[ema_col].to_numpy(dtype=float) if has_ema else np.full(len(x), np.nan))
+
+            actions = df_last["TradeAction"].to_numpy() if "TradeAction" in df_last.columns else None
+            for k, sc in self.scatters.items():
+                if actions is None:
+                    sc.set_offsets(np.empty((0, 2)))
+                else:
+                    m = actions == k
+                    sc.set_offsets(np.column_stack([x[m], price[m]]))
+
+            spans = session_spans(df_last["Session"], x) if "Session" in df_last.columns else {}
+            for k, coll in self.spans.items():
+                coll.set_verts([[(x0, 0), (x0, 1), (x1, 1), (x1, 0)] for x0, x1 in spans.get(k, [])])
+
+            if sentiment:
+                self.sentiment_text.set_text("\n".join([f"{k}: {v}" for k, v in sentiment.items()]))
+                self.sentiment_text.set_visible(True)
+                self.fig.subplots_adjust(right=0.72)
+            else:
+                self.sentiment_text.set_visible(False)
+                self.fig.subplots_adjust(right=0.97)
+
+            long_range = len(x) and (x[-1] - x[0]) > 60   # days
+            self.ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m" if long_range else "%m-%d\n%H:%M"))
+            self.ax.set_title(title or f"USDMXN Signals ({len(df)} bars)")
+            self.ax.relim()
+            self.ax.autoscale_view()
+            # zlib level 1: the default level spends most of the time compressing flat colour areas
+            self.fig.savefig(fname, dpi=self.dpi, pil_kwargs={"compress_level": 1})
+        return fname
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+_worker = None
+
+
+def get_renderer():
+    """Process-wide renderer, built on first use."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
+
 
 def export_trade_chart(df, fname="outputs/alerts/trade_chart.png",
                        price_col="Close", ema_col="EMA_50",
-                       sentiment=None):
+                       sentiment=None, bars=300):
     """
     Save a PNG of the last ~300 bars with BUY/SELL/EXIT markers,
     shading London & NY sessions, and adding sentiment text if provided.
+    bars=None charts the whole frame (downsampled to the image width).
     """
-
-    #os.makedirs(os.path.dirname(fname), exist_ok=True)
-
-    df_last = df.tail(300).copy()
-    if df_last.empty or price_col not in df_last.columns:
+    if df.empty:
         raise ValueError("DataFrame empty or missing price column for chart export.")
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    x_all = mdates.date2num(df_last.index.to_pydatetime())
-
-    # Price + EMA
-    ax.plot(x_all, df_last[price_col], label=price_col, color="black", linewidth=1.2)
-    if ema_col in df_last.columns:
-        ax.plot(x_all, df_last[ema_col], label=ema_col, color="blue", linewidth=1.0)
-
-    # Shading sessions (London/NY)
-    if "Session" in df_last.columns:
-        sessions = df_last["Session"].astype(str)
-        times = mdates.date2num(df_last.index.to_pydatetime())
-        current, start_idx = None, None
-        for i, s in enumerate(sessions):
-            if s != current:
-                if current in ("London", "NY") and start_idx is not None:
-                    ax.axvspan(times[start_idx], times[i - 1],
-                               facecolor="yellow" if current=="London" else "lightblue",
-                               alpha=0.2, zorder=0, label=current)
-                current, start_idx = s, i
-        if current in ("London", "NY") and start_idx is not None:
-            ax.axvspan(times[start_idx], times[-1],
-                       facecolor="yellow" if current=="London" else "lightblue",
-                       alpha=0.2, zorder=0, label=current)
-
-    # Trade markers
-    if "TradeAction" in df_last.columns:
-        buys     = df_last[df_last["TradeAction"]=="BUY"]
-        sells    = df_last[df_last["TradeAction"]=="SELL"]
-        exits_tp = df_last[df_last["TradeAction"]=="EXIT-TP"]
-        exits_sl = df_last[df_last["TradeAction"]=="EXIT-SL"]
-
-        ax.scatter(mdates.date2num(buys.index),  buys[price_col], marker="^", c="green", s=60, label="BUY", zorder=3)
-        ax.scatter(mdates.date2num(sells.index), sells[price_col], marker="v", c="red",   s=60, label="SELL", zorder=3)
-        ax.scatter(mdates.date2num(exits_tp.index), exits_tp[price_col], marker="o", c="blue", s=40, label="EXIT-TP", zorder=3)
-        ax.scatter(mdates.date2num(exits_sl.index), exits_sl[price_col], marker="x", c="orange", s=60, label="EXIT-SL", zorder=3)
-
-    # Add sentiment text box
-    if sentiment:
-        sentiment_str = "\n".join([f"{k}: {v}" for k, v in sentiment.items()])
-        ax.text(1.01, 0.5, sentiment_str,
-                transform=ax.transAxes,
-                fontsize=9,
-                verticalalignment="center",
-                bbox=dict(facecolor="white", alpha=0.8, edgecolor="gray"))
-
-    # Formatting
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m-%d\n%H:%M"))
-    ax.set_title("USDMXN Signals (last 300 bars)")
-    ax.grid(True, alpha=0.3)
-    ax.legend(loc="best")
-    fig.autofmt_xdate()
-    fig.tight_layout()
-
-    fig.savefig(fname, dpi=150)
-    plt.close(fig)
+    if bars:
+        title = f"USDMXN Signals (last {min(bars, len(df))} bars)"
+        df = df.tail(bars)
+    else:
+        title = f"USDMXN Signals {df.index[0]:%Y-%m-%d} → {df.index[-1]:%Y-%m-%d} ({len(df)} bars)"
+    get_renderer().render(df, fname, price_col=price_col, ema_col=ema_col, sentiment=sentiment, title=title)
     print(f"Chart exported to {fname}")
     return fname
+
+
+def submit_chart(df, fname, price_col="Close", ema_col="EMA_50", sentiment=None, bars=300):
+    """
+    Render on the background chart worker and return a Future for the path,
+    so callers can keep going (CSV writes, email body) while it draws.
+    Only the columns the chart needs are copied, the caller may mutate df.
+    """
+    global _worker
+    if _worker is None:
+        _worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart")
+    cols = [c for c in (price_col, ema_col, "Session", "TradeAction") if c in df.columns]
+    snap = (df[cols].tail(bars) if bars else df[cols]).copy()
+    return _worker.submit(export_trade_chart, snap, fname, price_col, ema_col,
+                          dict(sentiment) if sentiment else None, bars)
@@ -0,0 +1,99 @@
+# src/chunked_backtest.py
+"""
+Backtest a bars CSV too large for memory, one block of rows at a time.
+
+Each block is computed together with a warm-up tail of the previous raw bars
+(the same warm-up the feature store uses), so indicators come out as in the
+in-memory run; rows of the last, possibly incomplete H1 bucket are held back
+to the next block because add_mtf_features reads the hour's latest close.
+The open position and equity carry over via equity_with_trades(state=...)
+and KPIs accumulate in StreamingKPIs. Peak memory ~ block + warm-up rows.
+
+    python src/chunked_backtest.py --bars data/market/USDMXN_M1.csv --block 200000
+"""
+import os, json, argparse
+import numpy as np
+import pandas as pd
+from spec_schema import StrategySpec
+from signal_engine import add_features
+from backtest import simulate
+from backtest_utils import StreamingKPIs
+from session_calendar import add_sessions
+from feature_store import warmup_bars, MTF_BUCKET
+
+RAW_COLS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def read_blocks(path, block):
+    """Raw OHLCV blocks of `block` rows from a Datetime-indexed CSV (sorted by time)."""
+    for chunk in pd.read_csv(path, parse_dates=["Datetime"], index_col="Datetime", chunksize=block):
+        if "Volume" not in chunk.columns:
+            chunk["Volume"] = 0
+        yield chunk[RAW_COLS]
+
+
+def _bucket_start(work):
+    """Position of the first row in work's last H1 bucket."""
+    ns = work.index.as_unit("ns").asi8
+    return int(np.searchsorted(ns, ns[-1] - ns[-1] % MTF_BUCKET.value, side="left"))
+
+
+def chunked_backtest(blocks, spec: StrategySpec, bar=None, out_csv=None, tol=1e-12):
+    """
+    Run simulate() over an iterable of raw OHLCV blocks (consecutive, sorted).
+    Returns (kpis, summary); rows with signals/trades go to out_csv if given.
+    """
+    kpi, state = StreamingKPIs(), {}
+    tail = pending = None            # raw bars already emitted (warm-up) / held back
+    warm = None
+    counts = {"bars": 0, "blocks": 0, "peak_rows": 0}
+    signals, actions = {}, {}
+
+    def emit(feats):
+        df = simulate(feats, spec, features=feats, state=state)
+        kpi.update(df["Equity"].to_numpy())
+        counts["bars"] += len(df)
+        for k, v in df["Signal"].value_counts().items():
+            signals[k] = signals.get(k, 0) + int(v)
+        for k, v in df["TradeAction"].value_counts().items():
+            actions[k] = actions.get(k, 0) + int(v)
+        if out_csv:
+            df.to_csv(out_csv, mode="a" if os.path.exists(out_csv) else "w",
+                      header=not os.path.exists(out_csv), index_label="Datetime")
+
+    if out_csv and os.path.exists(out_csv):
+        os.remove(out_csv)
+    for raw in blocks:
+        if raw.empty:
+            continue
+        if warm is None:
+            step = bar or raw.index.to_series().diff().min()
+            warm = warmup_bars(spec.indicators, pd.Timedelta(step), tol)
+        work = pd.concat([x for x in (tail, pending, add_sessions(raw)) if x is not None])
+        n_tail = 0 if tail is None else len(tail)
+        cut = max(_bucket_start(work), n_tail)
+        counts["blocks"] += 1
+        counts["peak_rows"] = max(counts["peak_rows"], len(work))
+        if cut > n_tail:
+            emit(add_features(work, spec).iloc[n_tail:cut])
+        tail, pending = work.iloc[max(0, cut - warm):cut], work.iloc[cut:]
+
+    if pending is not None and len(pending):
+        work = pd.concat([tail, pending])
+        emit(add_features(work, spec).iloc[len(tail):])
+    summary = {**counts, "signals": signals, "trades": actions,
+               "open_position": state.get("side") if state.get("in_trade") else None}
+    return kpi.result(), summary
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Block-wise backtest of a large bars CSV")
+    ap.add_argument("--bars", default="data/market/USDMXN_M15.csv")
+    ap.add_argument("--spec", default="outputs/specs/usdmxn_quarters_bmm.json")
+    ap.add_argument("--block", type=int, default=100_000, help="Rows read per block")
+    ap.add_argument("--out", help="Write signals/trades rows to this CSV")
+    args = ap.parse_args()
+
+    spec = StrategySpec.model_validate_json(open(args.spec).read())
+    k, summary = chunked_backtest(read_blocks(args.bars, args.block), spec, out_csv=args.out)
+    print(json.dumps({"kpis": k, **summary}, indent=2, default=float))
@@ -0,0 +1,109 @@
+# src/dashboard_data.py
+import io, os, threading
+import pandas as pd
+from sentiment import sentiment_series
+from chart_export import export_trade_chart
+
+_CHECK = 256   # bytes re-read before the old end of file to detect rewrites
+
+
+class SignalFeed:
+    """
+    Memoized view of the signals CSV for the dashboard.
+    - file unchanged (mtime/size): nothing is read
+    - file grew and the old bytes are intact: only the appended rows are parsed
+    - file rewritten: full reload
+    Derived results (sentiment history, chart) are cached per data version,
+    and the sentiment history is extended incrementally on appends.
+    One instance is shared by all dashboard sessions, so loads and memoized
+    computations run under a lock.
+    """
+
+    def __init__(self, path, window=50):
+        self.path = path
+        self.window = window
+        self.df = None
+        self.version = 0
+        self.appended = None        # rows added by the last load (None = full reload)
+        self._sig = None
+        self._offset = 0            # bytes consumed (always at a line boundary)
+        self._check = b""
+        self._header = b""
+        self._memo = {}
+        self._sent = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        st = os.stat(self.path)
+        sig = (st.st_mtime_ns, st.st_size)
+        if sig == self._sig:
+            return self.df
+
+        with open(self.path, "rb") as f:
+            if self.df is not None and st.st_size >= self._offset and self._intact(f):
+                f.seek(self._offset)
+                new = self._parse(f.read(), header=False)
+                self.appended = len(new)
+                self.df = pd.concat([self.df, new]) if len(new) else self.df
+            else:
+                self._offset = 0
+                f.seek(0)   # _intact() may have moved the handle
+                self.df = self._parse(f.read(), header=True)
+                self.appended = None
+        self._sig = sig
+        if self.appended != 0:
+            self.version += 1
+        return self.df
+
+    def _intact(self, f):
+        start = max(self._offset - _CHECK, 0)
+        f.seek(start)
+        return f.read(self._offset - start) == self._check
+
+    def _parse(self, data, header):
+        end = data.rfind(b"\n") + 1   # a half-written last line waits for the next load
+        body = data[:end]
+        if header:
+            nl = body.find(b"\n") + 1
+            self._header, body_rows = body[:nl], body[nl:]
+        else:
+            body_rows = body
+        self._offset += end
+        # from the bytes just parsed, so the check always describes the data in self.df
+        self._check = ((b"" if header else self._check) + body)[-_CHECK:]
+        if not body_rows:
+            return self.df.iloc[:0] if self.df is not None else pd.DataFrame()
+        df = pd.read_csv(io.BytesIO(self._header + body_rows), parse_dates=["Datetime"])
+        return df.set_index("Datetime")
+
+    def memo(self, name, fn):
+        """fn(df) computed once per data version."""
+        with self._lock:
+            hit = self._memo.get(name)
+            if hit is None or hit[0] != self.version:
+                hit = (self.version, fn(self.df))
+                self._memo[name] = hit
+            return hit[1]
+
+    def sentiment_history(self):
+        """sentiment_series(df), extending only the appended tail when possible."""
+        with self._lock:
+            if self._sent is not None and self._sent[0] == self.version:
+                return self._sent[1]
+            n_new = self.appended
+            if self._sent is None or n_new is None or self._sent[0] != self.version - 1:
+                ser = sentiment_series(self.df, self.window)
+            else:
+                tail = sentiment_series(self.df.tail(n_new + self.window + 1), self.window).tail(n_new)
+                ser = pd.concat([self._sent[1], tail])
+                ser["Quarter"] = ser["Quarter"].astype("category")
+            self._sent = (self.version, ser)
+            return ser
+
+    def chart(self, fname, sentiment=None):
+        """Chart PNG rendered once per data version."""
+        return self.memo(f"chart:{fname}", lambda df: export_trade_chart(df, fname, sentiment=sentiment))
@@ -0,0 +1,147 @@
+# src/dedup.py
+import hashlib, json
+import numpy as np
+from collections import defaultdict
+
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles; near-identical texts differ in few bits."""
+    words = text.lower().split()
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(len(words) - shingle + 1, 1))]
+    h = np.array([int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+                  for g in grams], dtype=np.uint64)
+    bits = ((h[:, None] >> _BITS) & np.uint64(1)).astype(np.int32)
+    votes = (2 * bits - 1).sum(axis=0)
+    return int(((votes > 0).astype(np.uint64) << _BITS).sum())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def bands(max_hamming):
+    """
+    (shift, width) of the SimHash bands: max_hamming + 1 bands (at least 4 x 16
+    bits), so two hashes within max_hamming bits match one band exactly
+    (pigeonhole) and no pairwise scan is needed.
+    """
+    if not 0 <= max_hamming <= 15:
+        raise ValueError(f"max_hamming must be in 0..15 (got {max_hamming}); narrower bands match everything")
+    nb = max(4, max_hamming + 1)
+    edges = [64 * b // nb for b in range(nb + 1)]
+    return [(lo, hi - lo) for lo, hi in zip(edges, edges[1:])]
+
+
+def dedup_text(rows, max_hamming=3, seen=()):
+    """
+    Drop rows whose SimHash is within max_hamming bits of an earlier kept row
+    or of a row in `seen` (already kept, with 'simhash'). Adds 'simhash' to
+    every row and 'dup_of' (id of the kept row) to dropped ones.
+    Returns (kept_rows, dropped_count).
+    """
+    bs = bands(max_hamming)
+    index = [defaultdict(list) for _ in bs]
+    kept = []
+
+    def keys(h):
+        return [(h >> lo) & ((1 << w) - 1) for lo, w in bs]
+
+    for r in seen:
+        for b, key in enumerate(keys(r["simhash"])):
+            index[b][key].append((r["simhash"], r.get("id")))
+    for r in rows:
+        h = r.get("simhash") or simhash(r["text"])
+        r["simhash"] = h
+        ks = keys(h)
+        dup = next((i for b, key in enumerate(ks) for other, i in index[b][key]
+                    if hamming(h, other) <= max_hamming), False)
+        if dup is not False:
+            r["dup_of"] = dup
+            continue
+        for b, key in enumerate(ks):
+            index[b][key].append((h, r.get("id")))
+        kept.append(r)
+    return kept, len(rows) - len(kept)
+
+
+def dedup_embeddings(vecs, threshold=0.95, batch=4096):
+    """
+    Near-duplicates among normalized embeddings: row i is dropped if its cosine
+    with an earlier kept row is >= threshold. Uses FAISS range search in batches.
+    Returns dup: position of the kept row each row duplicates, -1 if kept.
+    """
+    import faiss
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    dup = np.full(len(vecs), -1, dtype=np.int64)
+    for s in range(0, len(vecs), batch):
+        lims, _, I = index.range_search(vecs[s:s + batch], threshold)
+        for q in range(len(lims) - 1):
+            i = s + q
+            if dup[i] >= 0:
+                continue
+            nb = I[lims[q]:lims[q + 1]]
+            later = nb[nb > i]
+            dup[later[dup[later] < 0]] = i
+    return dup
+
+
+def match_existing(vecs, index, threshold=0.95, allowed=None, batch=4096):
+    """
+    For each normalized embedding, the id of its closest neighbour in an
+    ID-mapped inner-product index with cosine >= threshold (-1 if none).
+    Only ids in `allowed` count when given.
+    """
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    out = np.full(len(vecs), -1, dtype=np.int64)
+    allowed = None if allowed is None else np.fromiter(allowed, dtype=np.int64)
+    for s in range(0, len(vecs), batch):
+        lims, D, I = index.range_search(vecs[s:s + batch], threshold)
+        for q in range(len(lims) - 1):
+            d, i = D[lims[q]:lims[q + 1]], I[lims[q]:lims[q + 1]]
+            if allowed is not None:
+                ok = np.isin(i, allowed)
+                d, i = d[ok], i[ok]
+            if len(i):
+                out[s + q] = i[np.argmax(d)]
+    return out
+
+
+def collapse_hits(hits, k, max_hamming=3):
+    """Drop retrieval hits that are near-duplicates of a better-ranked hit; return the top k."""
+    out, seen = [], []
+    for r in hits:
+        h = r.get("simhash") or simhash(r["text"])
+        if any(hamming(h, o) <= max_hamming for o in seen):
+            continue
+        seen.append(h)
+        out.append(r)
+        if len(out) == k:
+            break
+    return out
+
+
+def report(n_in, n_text, n_emb, dim, text_bytes_in, text_bytes_out):
+    n_out = n_in - n_text - n_emb
+    shrink = 1 - n_out / max(n_in, 1)
+    return {
+        "chunks_in": n_in,
+        "dropped_simhash": n_text,
+        "dropped_cosine": n_emb,
+        "chunks_out": n_out,
+        "index_shrink_pct": round(100 * shrink, 2),
+        "index_mb_saved": round((n_in - n_out) * (dim or 0) * 4 / 2**20, 2),
+        "text_mb_saved": round((text_bytes_in - text_bytes_out) / 2**20, 2),
+    }
+
+
+if __name__ == "__main__":
+    # Dry run over kb/chunks: how much would text dedup remove?
+    from build_kb import load_chunks
+    rows = load_chunks()
+    kept, dropped = dedup_text(rows)
+    print(json.dumps(report(len(rows), dropped, 0, None,
+                            sum(len(r["text"]) for r in rows), sum(len(r["text"]) for r in kept)), indent=2))
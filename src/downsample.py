@@ -0,0 +1,67 @@
+# src/downsample.py
+import numpy as np
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Indices of the min and max of y in each of n_buckets equal slices, plus the
+    first and last point. Keeps every spike visible at 2 points per pixel.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    size = int(np.ceil(n / n_buckets))
+    pad = size * n_buckets - n
+    filled = np.where(np.isnan(y), np.nanmean(y), y)
+    lo = np.pad(filled, (0, pad), constant_values=np.inf).reshape(n_buckets, size)
+    hi = np.pad(filled, (0, pad), constant_values=-np.inf).reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    idx = np.concatenate([base + lo.argmin(axis=1), base + hi.argmax(axis=1), [0, n - 1]])
+    return np.unique(idx[idx < n])
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: n_out indices that best preserve the line's shape."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)   # n_out-2 buckets between first and last
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        s, e = edges[b], edges[b + 1]
+        ns, ne = edges[b + 1], (edges[b + 2] if b + 2 < len(edges) else n)
+        cx, cy = x[ns:ne].mean(), np.nanmean(y[ns:ne]) if ne > ns else y[-1]
+        area = np.abs((x[a] - cx) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (cy - y[a]))
+        a = s + int(np.nanargmax(area)) if np.isfinite(area).any() else s
+        out[b + 1] = a
+    return out
+
+
+def downsample(df, width_px=1200, price_col="Close", method="minmax",
+               keep_cols=("TradeAction",), x=None):
+    """
+    Reduce df to about a pixel-width budget of rows for plotting. Rows with a
+    trade marker (non-null, non-FLAT value in keep_cols, incl. SL/TP exits)
+    are always kept so no trade disappears when zoomed out.
+    """
+    if len(df) <= 2 * width_px:
+        return df
+    y = df[price_col].to_numpy(dtype=float)
+    if method == "lttb":
+        xs = np.arange(len(df), dtype=float) if x is None else x
+        idx = lttb_indices(xs, y, 2 * width_px)
+    else:
+        idx = minmax_indices(y, width_px)
+
+    keep = np.zeros(len(df), dtype=bool)
+    keep[idx] = True
+    for c in keep_cols:
+        if c in df.columns:
+            v = df[c]
+            keep |= (v.notna() & (v != "FLAT")).to_numpy()
+    return df[keep]
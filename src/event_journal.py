@@ -0,0 +1,182 @@
+# src/event_journal.py
+# Append-only JSONL journal used as a local pub/sub channel between the
+# signal pipeline (writer) and the dashboard (reader). Readers keep a byte
+# offset and only parse what was appended since their last poll.
+import os, json, time
+from collections import deque
+import pandas as pd
+
+JOURNAL_PATH = "outputs/stream/events.jsonl"
+MAX_BYTES    = 20 * 1024 * 1024     # rotate to events.jsonl.1 past this size
+
+
+def _json_default(o):
+    # numpy scalars -> python, anything else (Timestamps...) as text
+    return o.item() if hasattr(o, "item") else str(o)
+
+
+class JournalWriter:
+    """
+    publish(kind, data) appends one line {"t", "kind", "data"}. Each event is a
+    single O_APPEND write, so concurrent readers never see a torn line other
+    than a not-yet-finished last one, which they skip until the next poll.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.state_path = f"{path}.state.json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def publish(self, kind, data):
+        line = json.dumps({"t": time.time(), "kind": kind, "data": data}, default=_json_default) + "\n"
+        self._maybe_rotate()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def publish_bars(self, df, cols):
+        """
+        Publish the rows newer than the last published bar (the last one is
+        re-sent, it may still have been forming). Returns the number of rows sent.
+        """
+        last = self._state().get("last_bar")
+        new = df if last is None else df[df.index >= pd.Timestamp(last)]
+        if new.empty:
+            return 0
+        rows = new[[c for c in cols if c in new.columns]].reset_index(names="Datetime")
+        rows["Datetime"] = rows["Datetime"].map(pd.Timestamp.isoformat)
+        # NaN is not valid JSON
+        rows = rows.astype(object).where(rows.notna(), None)
+        self.publish("bars", rows.to_dict(orient="records"))
+        self._save_state({"last_bar": new.index[-1].isoformat()})
+        return len(new)
+
+    def _maybe_rotate(self):
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            pass
+
+    def _state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+
+class JournalReader:
+    """
+    Tails the journal from a byte offset. poll() returns the complete events
+    appended since the last call. If the file was rotated or truncated
+    (different inode, or smaller than our offset) it starts over at 0.
+    from_end=True skips the history that is already there.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, from_end=False):
+        self.path = path
+        self.offset = 0
+        self._ino = None
+        if from_end and os.path.exists(path):
+            st = os.stat(path)
+            self.offset, self._ino = st.st_size, st.st_ino
+
+    def poll(self, max_bytes=4 * 1024 * 1024):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        events = []
+        if st.st_ino != self._ino or st.st_size < self.offset:
+            # rotated: drain what we hadn't read of the old file first
+            old = f"{self.path}.1"
+            if self._ino is not None and os.path.exists(old) and os.stat(old).st_ino == self._ino:
+                events, _ = self._read(old, self.offset, max_bytes, final=True)
+            self.offset, self._ino = 0, st.st_ino
+        if st.st_size > self.offset:
+            new, self.offset = self._read(self.path, self.offset, max_bytes)
+            events += new
+        return events
+
+    @staticmethod
+    def _read(path, offset, max_bytes, final=False):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+        # half-written last line waits for the next poll (unless the file is closed for good)
+        end = len(data) if final else data.rfind(b"\n") + 1
+        events = []
+        for line in data[:end].splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue                # garbage line, skip rather than stall the feed
+        return events, offset + end
+
+
+class LiveFrame:
+    """
+    In-memory bar/signal frame fed by journal events, bounded to max_bars rows.
+    "bars" events upsert by timestamp; "signal"/"alert" events go to short
+    bounded logs for display.
+    """
+
+    def __init__(self, max_bars=5000, max_events=200):
+        self.max_bars = max_bars
+        self.df = pd.DataFrame()
+        self.signals = deque(maxlen=max_events)
+        self.alerts = deque(maxlen=max_events)
+        self.version = 0
+        self.last_event_t = None
+
+    def apply(self, events):
+        """Apply events in order; returns True if anything changed."""
+        batches = []
+        for ev in events:
+            kind, data = ev.get("kind"), ev.get("data")
+            if kind == "bars" and data:
+                batches.append(data)
+            elif kind == "signal":
+                self.signals.append(data)
+            elif kind == "alert":
+                self.alerts.append(data)
+            self.last_event_t = ev.get("t", self.last_event_t)
+        if batches:
+            new = pd.DataFrame([r for b in batches for r in b])
+            new["Datetime"] = pd.to_datetime(new["Datetime"], utc=True)
+            new = new.set_index("Datetime")
+            df = pd.concat([self.df, new]) if len(self.df) else new
+            # later rows win for re-sent bars
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            self.df = df.iloc[-self.max_bars:]
+        if events:
+            self.version += 1
+        return bool(events)
+
+    def lag_s(self):
+        """Seconds between the newest event's publish time and now."""
+        return None if self.last_event_t is None else time.time() - self.last_event_t
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Follow the local event journal.")
+    ap.add_argument("--path", default=JOURNAL_PATH)
+    ap.add_argument("--from-start", action="store_true")
+    args = ap.parse_args()
+    reader = JournalReader(args.path, from_end=not args.from_start)
+    while True:
+        for ev in reader.poll():
+            data = ev["data"]
+            print(ev["kind"], f"{len(data)} rows" if ev["kind"] == "bars" else data)
+        time.sleep(0.25)
@@ -0,0 +1,149 @@
+# src/exit_grid.py
+"""
+KPIs for a whole grid of TP/SL exits from one set of entry signals.
+
+Same trade rules as equity_with_trades (one position at a time, entry at
+the signal bar's close, SL checked before TP on the same bar, signals
+ignored while in a trade, -1% on SL, +tp_rr% on TP), but every
+(tp_rr, sl_atr_mult) pair is evaluated together:
+- per signal bar, the first SL and TP bar for every pair come from running
+  min/max of the bars after it plus one searchsorted per threshold
+- then all pairs walk their trade chains in lockstep, one trade per step
+
+    python src/exit_grid.py --tp 0.5 5 --sl 0.5 4 --steps 20
+"""
+import os, json, argparse
+import numpy as np
+import pandas as pd
+from spec_schema import StrategySpec
+from backtest import load_bars, entry_signals, exit_params
+from backtest_utils import BARS_PER_YEAR
+from session_calendar import add_sessions
+
+GRID_CSV = "outputs/backtests/exit_grid.csv"
+KPIS = ["TotalReturn", "Sharpe-ish", "MaxDD", "Trades", "WinRate"]
+
+
+def first_exits(df, entries, tp_rr, sl_atr_mult, atr_col="ATR_14", horizon=256):
+    """
+    For each entry bar (positions into df) and each (tp, sl) pair: the bar
+    the trade exits on (len(df) if never) and whether it was the TP.
+    Returns (exit_bar, win), both shaped (entries, len(tp_rr), len(sl_atr_mult)).
+    """
+    high, low, close = (df[c].to_numpy(dtype=float) for c in ("High", "Low", "Close"))
+    atr = df[atr_col].to_numpy(dtype=float) if atr_col in df.columns else np.full(len(df), 0.001)
+    side = df["Signal"].to_numpy()
+    tp_rr, sl_mult = np.asarray(tp_rr, dtype=float), np.asarray(sl_atr_mult, dtype=float)
+    n, shape = len(df), (len(entries), len(tp_rr), len(sl_mult))
+    exit_bar = np.full(shape, n, dtype=np.int64)
+    win = np.zeros(shape, dtype=bool)
+
+    for k, i in enumerate(entries):
+        price, a = close[i], atr[i]
+        long = side[i] == "BUY"
+        # same float expressions as equity_with_trades, so hits agree bar for bar
+        if long:
+            sl = price - sl_mult * a
+            tp = price + tp_rr[:, None] * (price - sl)[None, :]
+        else:
+            sl = price + sl_mult * a
+            tp = price - tp_rr[:, None] * (sl - price)[None, :]
+        h = horizon
+        while True:
+            j1 = min(n, i + 1 + h)
+            if long:   # first bar with Low <= sl / High >= tp
+                s_hit = np.searchsorted(-np.minimum.accumulate(low[i + 1:j1]), -sl, side="left")
+                t_hit = np.searchsorted(np.maximum.accumulate(high[i + 1:j1]), tp, side="left")
+            else:      # first bar with High >= sl / Low <= tp
+                s_hit = np.searchsorted(np.maximum.accumulate(high[i + 1:j1]), sl, side="left")
+                t_hit = np.searchsorted(-np.minimum.accumulate(low[i + 1:j1]), -tp, side="left")
+            m = j1 - (i + 1)
+            first = np.minimum(s_hit[None, :], t_hit)
+            if (first < m).all() or j1 == n or not np.isfinite(a):
+                break
+            h *= 4
+        hit = first < m
+        exit_bar[k] = np.where(hit, i + 1 + first, n)
+        win[k] = hit & (t_hit < s_hit[None, :])
+    return exit_bar, win
+
+
+def grid_kpis(df, tp_rr, sl_atr_mult, atr_col="ATR_14", init_equity=10000):
+    """
+    KPI table (one row per tp_rr x sl_atr_mult) for df with a Signal column,
+    matching equity_with_trades + kpis for each pair.
+    """
+    tp_rr, sl_mult = np.asarray(tp_rr, dtype=float), np.asarray(sl_atr_mult, dtype=float)
+    n = len(df)
+    entries = np.flatnonzero(df["Signal"].isin(["BUY", "SELL"]).to_numpy())
+    exit_bar, win = first_exits(df, entries, tp_rr, sl_mult, atr_col)
+
+    P = len(tp_rr) * len(sl_mult)
+    exit_bar, win = exit_bar.reshape(len(entries), P), win.reshape(len(entries), P)
+    gain = np.repeat(1 + 0.01 * tp_rr, len(sl_mult))
+    eq = np.full(P, float(init_equity))
+    peak, dd = eq.copy(), np.zeros(P)
+    s1, s2 = np.zeros(P), np.zeros(P)           # sum / sum of squares of the nonzero bar returns
+    trades, wins = np.zeros(P, dtype=np.int64), np.zeros(P, dtype=np.int64)
+
+    cur = np.zeros(P, dtype=np.int64)           # index into entries of each pair's next trade
+    live = np.flatnonzero(cur < len(entries))
+    while len(live):
+        k = cur[live]
+        e, w = exit_bar[k, live], win[k, live]
+        closed = e < n                           # an unclosed trade ends that pair's chain
+        p, w = live[closed], w[closed]
+        new = eq[p] * np.where(w, gain[p], 1 - 0.01)
+        r = new / eq[p] - 1
+        eq[p] = new
+        s1[p] += r
+        s2[p] += r * r
+        trades[p] += 1
+        wins[p] += w
+        peak[p] = np.maximum(peak[p], new)
+        dd[p] = np.minimum(dd[p], new / peak[p] - 1)
+        cur[live] = np.where(closed, np.searchsorted(entries, e + 1, side="left"), len(entries))
+        live = live[cur[live] < len(entries)]
+
+    nr = max(n - 1, 1)                           # bar returns, as in equity.pct_change()
+    mean = s1 / nr
+    std = np.sqrt(np.maximum(s2 / nr - mean * mean, 0))
+    tt, ss = np.meshgrid(tp_rr, sl_mult, indexing="ij")
+    return pd.DataFrame({
+        "tp_rr": tt.ravel(), "sl_atr_mult": ss.ravel(),
+        "TotalReturn": eq / init_equity - 1,
+        "Sharpe-ish": mean / (std + 1e-9) * np.sqrt(BARS_PER_YEAR),
+        "MaxDD": dd,
+        "Trades": trades,
+        "WinRate": np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+    })
+
+
+def heatmap(table, kpi="TotalReturn"):
+    """tp_rr x sl_atr_mult pivot of one KPI."""
+    return table.pivot(index="tp_rr", columns="sl_atr_mult", values=kpi)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="KPI heatmap over a TP/SL exit grid")
+    ap.add_argument("--bars", default="data/market/USDMXN_M15.csv")
+    ap.add_argument("--spec", default="outputs/specs/usdmxn_quarters_bmm.json")
+    ap.add_argument("--tp", type=float, nargs=2, default=[0.5, 5.0], metavar=("LO", "HI"), help="tp_rr range")
+    ap.add_argument("--sl", type=float, nargs=2, default=[0.5, 4.0], metavar=("LO", "HI"), help="sl_atr_mult range")
+    ap.add_argument("--steps", type=int, default=20, help="Grid points per axis")
+    ap.add_argument("--kpi", default="TotalReturn", choices=KPIS)
+    ap.add_argument("--out", default=GRID_CSV)
+    args = ap.parse_args()
+
+    spec = StrategySpec.model_validate_json(open(args.spec).read())
+    df = entry_signals(add_sessions(load_bars(args.bars)), spec)
+    table = grid_kpis(df, np.linspace(*args.tp, args.steps), np.linspace(*args.sl, args.steps))
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    table.to_csv(args.out, index=False)
+    hm = heatmap(table, args.kpi)
+    hm.to_csv(args.out.replace(".csv", f"_{args.kpi}.csv"))
+    print(hm.round(4).to_string())
+    best = table.loc[table[args.kpi].idxmax()]
+    print(f"Spec exit {exit_params(spec)}; best {args.kpi}: {json.dumps(best.to_dict(), default=float)}")
+    print(f"Wrote {args.out}")
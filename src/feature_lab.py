@@ -1,6 +1,7 @@
 # src/feature_lab.py
 import pandas as pd
-import numpy as np
+from sweeps import sweep_bits
+from quarter_levels import get_grid
 
 # -----------------
 # RSI (Relative Strength Index)
@@ -35,18 +36,17 @@ def sma(series, n):
     return series.rolling(n).mean()
 
 def quarter_grid(price, size_pips=25, pip_scale=0.0001):
-    size_pips = int(size_pips)   # <-- also cast here
-    pip_scale = float(pip_scale)
-    grid = np.floor(price / (size_pips * pip_scale)) * (size_pips * pip_scale)
-    dist = price - grid
-    step = size_pips * pip_scale
-    labels = ["Q1", "Q2", "Q3", "Q4"]
-    idx = np.clip(np.floor(dist / step).astype(int), 0, 3)
-    return pd.Series([labels[i] for i in idx], index=price.index, name="QG")
-def quarter_distance_pips(close):
-    # map to nearest 00/25/50/75 levels
-    q = ((close*10000) % 2500)  # pip scale example, adjust for MXN decimals
-    return np.minimum(q, 2500 - q) / 100  # distance in pips approx
+    """QG as a Q1..Q4 categorical: which quarter of the 4-level "whole" the price is in."""
+    return get_grid(size_pips, pip_scale).categorical(price, name="QG")
+
+def quarter_distance_pips(close, size_pips=25, pip_scale=0.0001):
+    """
+    Distance to the nearest grid level (the 00/25/50/75 levels for size 25), in pips.
+    The old hardcoded MXN distance (*10000 % 2500) measured on a 0.25 grid:
+    pip_scale=0.01 reproduces it.
+    """
+    d = get_grid(size_pips, pip_scale).dist_pips(close)
+    return pd.Series(d, index=close.index) if isinstance(close, pd.Series) else d
 
 def add_mtf_features(df):
     h1 = df[["Open","High","Low","Close"]].resample("60min").last()
@@ -55,18 +55,15 @@ def add_mtf_features(df):
     df["H1_EMA_50_Slope"] = h1["EMA_50_Slope"].reindex(df.index, method="ffill")
     return df
 
-def add_extras(df):
+def add_extras(df, qg_dist=None):
+    # qg_dist: distance to the spec's QuarterGrid levels in pips (default grid if the spec has none)
     df["RSI_14_prev"] = df["RSI_14"].shift(1)
     df["ATR_14_Pips"] = df["ATR_14"] * 100  # adjust pip factor per instrument
-    df["QG_DistPips"] = quarter_distance_pips(df["Close"])
+    df["QG_DistPips"] = qg_dist if qg_dist is not None else quarter_distance_pips(df["Close"])
     return df
-def sweep_flags(df, lookback=20, pad_pips=5):
-    hh = df["High"].rolling(lookback).max().shift(1)
-    ll = df["Low"].rolling(lookback).min().shift(1)
-    took_high = df["High"] > (hh + pad_pips*1e-4)  # adjust pip scale if needed
-    took_low  = df["Low"]  < (ll - pad_pips*1e-4)
-    close_back_in_hi = took_high & (df["Close"] < hh)
-    close_back_in_lo = took_low  & (df["Close"] > ll)
-    df["SweepHi"] = close_back_in_hi.astype(int)
-    df["SweepLo"] = close_back_in_lo.astype(int)
+def sweep_flags(df, lookback=20, pad_pips=5, pip_scale=1e-4):
+    # single-window stop-hunt flags; see sweeps.add_sweeps for the multi-horizon version
+    hi, lo = sweep_bits(df, (lookback,), (pad_pips,), anchors=(), pip_scale=pip_scale)
+    df["SweepHi"] = hi.astype(int)
+    df["SweepLo"] = lo.astype(int)
     return df
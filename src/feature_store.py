@@ -0,0 +1,287 @@
+# src/feature_store.py
+"""
+On-disk store of add_features() output, one directory per instrument,
+timeframe and indicator set:
+
+    outputs/features/USDMXN_M15/<hash of the IndicatorDefs>/
+        schema.json     columns, dtypes, categories, committed row count
+        index.i8        bar timestamps (int64 ns)
+        <column>.bin    one flat array per column (categoricals as int8 codes)
+
+Closed bars never change, so update() only computes features for bars newer
+than the store, plus a warm-up tail of stored raw bars long enough that
+EMA/RSI recursions, rolling windows and the sweep anchors come out the same
+as a full recompute (EMA state decays below `tol`). The last hour is always
+redone because add_mtf_features' H1 bucket uses the hour's latest close.
+Columns are appended first and schema.json (the commit point) replaced last,
+so a crash leaves the previous rows readable. Windows that end before the
+stored bars and agree with them (older or middle slices) leave the store alone.
+"""
+import os, json, hashlib
+import numpy as np
+import pandas as pd
+from spec_schema import StrategySpec
+from signal_engine import add_features, condition_names
+from sweeps import LOOKBACKS
+
+FEATURE_DIR = "outputs/features"
+STORE_VERSION = 2          # bump when add_features output changes for the same indicators
+BAR = {"M5": "5min", "M15": "15min", "H1": "60min", "H4": "240min", "D1": "1D"}
+MTF_BUCKET = pd.Timedelta("60min")
+
+# what signalize / add_scores / equity_with_trades read besides the entry conditions
+BASE_COLUMNS = ["Open", "High", "Low", "Close", "Session", "SweepHi", "SweepLo", "RSI_14", "RSI_14_prev",
+                "QG_DistPips", "EMA_50", "EMA_200", "ATR_14", "ATR_14_Pips", "H1_EMA_50_Slope"]
+
+
+def indicator_hash(indicators):
+    """Stable short hash of the IndicatorDefs (order matters: aliases can shadow)."""
+    blob = json.dumps([STORE_VERSION] + [i.model_dump() for i in indicators], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def _ew_bars(alpha, tol):
+    """Bars until an adjust=False EWM forgets its starting value to within tol."""
+    return int(np.ceil(np.log(tol) / np.log1p(-alpha)))
+
+
+def warmup_bars(indicators, bar=pd.Timedelta("15min"), tol=1e-12):
+    """Bars of history needed before the first recomputed bar to match a full recompute."""
+    need = [15, max(LOOKBACKS) + 1, int(np.ceil(4 * pd.Timedelta("1D") / bar))]   # ATR_14, sweeps, prev_3day
+    for ind in indicators:
+        p = ind.params
+        if ind.name == "RSI":
+            need.append(_ew_bars(1 / p.get("period", 14), tol) + 2)
+        elif ind.name == "EMA":
+            need.append(_ew_bars(2 / (p.get("period", 21) + 1), tol))
+        elif ind.name in ("ATR", "SMA"):
+            need.append(int(p.get("period", 14)) + 1)
+        elif ind.name == "MACD":
+            need.append(_ew_bars(2 / (p.get("slow", 26) + 1), tol) + _ew_bars(2 / (p.get("signal", 9) + 1), tol))
+    # H1 EMA_50 slope: hours of decay, in bars
+    need.append(int(np.ceil((_ew_bars(2 / 51, tol) + 2) * max(MTF_BUCKET / bar, 1))))
+    return max(need)
+
+
+def columns_for(spec: StrategySpec, extra=()):
+    """Feature columns signalize/add_scores/equity_with_trades need for this spec."""
+    names = set()
+    for er in spec.entries:
+        names |= condition_names(er.condition) or set()   # unparsable: never true anyway
+    return list(dict.fromkeys([*BASE_COLUMNS, *sorted(names), *extra]))
+
+
+def _ns_index(index):
+    """int64 ns per bar: UTC for tz-aware indexes, wall time for naive ones."""
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.as_unit("ns").asi8
+
+
+class FeatureStore:
+    def __init__(self, spec: StrategySpec, instrument="USDMXN", timeframe=None, root=FEATURE_DIR, tol=1e-12):
+        self.spec = spec
+        self.timeframe = timeframe or spec.timeframe
+        self.key = indicator_hash(spec.indicators)
+        self.dir = os.path.join(root, f"{instrument}_{self.timeframe}", self.key)
+        self.warmup = warmup_bars(spec.indicators, pd.Timedelta(BAR[self.timeframe]), tol)
+        self.schema = self._load_schema()
+
+    # ---- files ----
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _col_path(self, col):
+        return self._path(f"{col}.bin")
+
+    def _load_schema(self):
+        try:
+            with open(self._path("schema.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_schema(self, schema):
+        tmp = self._path("schema.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=1)
+        os.replace(tmp, self._path("schema.json"))
+        self.schema = schema
+
+    @property
+    def rows(self):
+        return self.schema["rows"] if self.schema else 0
+
+    @property
+    def columns(self):
+        return list(self.schema["columns"]) if self.schema else []
+
+    def _array(self, path, dtype, start=0, stop=None):
+        stop = self.rows if stop is None else stop
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        mm = np.memmap(path, dtype=dtype, mode="r", shape=(self.rows,))
+        return np.array(mm[start:stop])
+
+    def _index_ns(self, start=0, stop=None):
+        return self._array(self._path("index.i8"), np.int64, start, stop)
+
+    # ---- encoding ----
+    @staticmethod
+    def _describe(s):
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            return {"dtype": "int8", "categories": [str(c) for c in s.cat.categories]}
+        if s.dtype == object:
+            return {"dtype": "int8", "categories": sorted(str(v) for v in s.dropna().unique())}
+        return {"dtype": np.dtype(s.dtype).str}
+
+    @staticmethod
+    def _encode(s, info):
+        """Column values as stored, or None if they don't fit the stored dtype/categories."""
+        if "categories" in info:
+            if isinstance(s.dtype, pd.CategoricalDtype) and [str(c) for c in s.cat.categories] == info["categories"]:
+                return s.cat.codes.to_numpy(np.int8)
+            cat = pd.Categorical(s.astype(object).where(s.notna(), None), categories=info["categories"])
+            if (cat.codes[s.notna().to_numpy()] < 0).any():
+                return None
+            return cat.codes.astype(np.int8)
+        if np.dtype(s.dtype).str != info["dtype"]:
+            return None
+        return s.to_numpy()
+
+    @staticmethod
+    def _decode(a, info):
+        if "categories" in info:
+            return pd.Categorical.from_codes(a, categories=info["categories"])
+        return a
+
+    def _tz(self, index):
+        return None if index.tz is None else str(index.tz)
+
+    # ---- read ----
+    def frame(self, columns=None, start=None, end=None):
+        """Stored features (all columns, or a subset) for bars in [start, end]."""
+        if not self.schema:
+            return pd.DataFrame()
+        cols = self.columns if columns is None else [c for c in columns if c in self.schema["columns"]]
+        idx = self._index_ns()
+        a = 0 if start is None else int(np.searchsorted(idx, self._ns(start), side="left"))
+        b = len(idx) if end is None else int(np.searchsorted(idx, self._ns(end), side="right"))
+        return self._rows(cols, a, b)
+
+    def _rows(self, cols, a, b):
+        index = pd.DatetimeIndex(self._index_ns(a, b).view("datetime64[ns]"), name=self.schema.get("index_name"))
+        if self.schema["tz"]:
+            index = index.tz_localize("UTC").tz_convert(self.schema["tz"])
+        info = self.schema["columns"]
+        data = {c: self._decode(self._array(self._col_path(c), info[c]["dtype"], a, b), info[c]) for c in cols}
+        return pd.DataFrame(data, index=index, columns=cols)
+
+    def features_for(self, bars, columns=None):
+        """
+        update() with these bars, then their features (index = bars.index).
+        Windows the store can't hold (older than its first bar) are computed directly.
+        """
+        self.update(bars)
+        got = self.frame(columns, start=bars.index[0], end=bars.index[-1])
+        if not got.index.equals(bars.index):
+            got = add_features(bars, self.spec)
+            got = got if columns is None else got[[c for c in columns if c in got.columns]]
+        return got
+
+    def _ns(self, ts):
+        ts = pd.Timestamp(ts)
+        if ts.tz is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        return ts.value
+
+    # ---- write ----
+    def update(self, bars):
+        """
+        Bring the store up to date with `bars` (raw OHLCV + Session, sorted).
+        Returns the number of rows (re)computed; 0 if nothing changed.
+        """
+        if bars.empty:
+            return 0
+        bars = bars.sort_index()
+        t = _ns_index(bars.index)
+        n = self.rows
+        if (n == 0 or self.schema["raw"] != list(bars.columns) or self.schema["tz"] != self._tz(bars.index)
+                or self.schema.get("index_name") != bars.index.name):
+            return self._rebuild(bars)
+
+        idx = self._index_ns()
+        if t[0] < idx[0] and t[-1] < idx[-1]:
+            return 0                         # older window: can't merge without losing stored rows
+        first = int(np.searchsorted(idx, t[0], side="left"))
+        if first == n:
+            return self._rebuild(bars)       # no overlap to prove the new bars follow the stored ones
+        # first stored row the new bars disagree with (revised or missing bars); n if none does
+        ov = t[t <= idx[-1]]
+        k = min(len(ov), n - first)
+        bad = np.flatnonzero(ov[:k] != idx[first:first + k])
+        r = first + int(bad[0]) if len(bad) else n
+        stop = min(r, first + k)
+        if stop > first:
+            info = self.schema["columns"]
+            pos = np.searchsorted(t, idx[first:stop])
+            for c in self.schema["raw"]:
+                new = self._encode(bars[c], info[c])
+                if new is None:
+                    return self._rebuild(bars)
+                new = new[pos]
+                old = self._array(self._col_path(c), info[c]["dtype"], first, stop)
+                same = (old == new) | (pd.isna(old) & pd.isna(new)) if old.dtype.kind == "f" else old == new
+                if not same.all():
+                    r = min(r, first + int(np.argmin(same)))
+        if r == 0:
+            return self._rebuild(bars)
+        # nothing stored differs and nothing is newer (e.g. an older or middle window)
+        if r == n and t[-1] <= idx[-1]:
+            return 0
+        # the H1 bucket of the first changed (or last stored) bar is redone: its rows read the hour's latest close
+        ref = idx[r] if r < n else idx[-1]
+        r = min(r, int(np.searchsorted(idx, ref - ref % MTF_BUCKET.value, side="left")))
+
+        c = max(r, first)
+        w0 = max(0, r - self.warmup)
+        hist = self._rows(self.schema["raw"], w0, c)
+        src = pd.concat([hist, bars[t > idx[c - 1]]])
+        src.index.name = bars.index.name
+        if "Session" in src.columns and isinstance(bars["Session"].dtype, pd.CategoricalDtype):
+            src["Session"] = src["Session"].astype(bars["Session"].dtype)
+        feats = add_features(src, self.spec).iloc[r - w0:]
+        if not self._append(feats, r):
+            return self._rebuild(bars)
+        return len(feats)
+
+    def _rebuild(self, bars):
+        feats = add_features(bars, self.spec)
+        os.makedirs(self.dir, exist_ok=True)
+        self._save_schema({
+            "key": self.key, "version": STORE_VERSION, "timeframe": self.timeframe,
+            "indicators": [i.model_dump() for i in self.spec.indicators],
+            "raw": list(bars.columns), "tz": self._tz(bars.index), "index_name": bars.index.name,
+            "columns": {c: self._describe(feats[c]) for c in feats.columns}, "rows": 0,
+        })
+        self._append(feats, 0)
+        return len(feats)
+
+    def _append(self, feats, at):
+        """Write feats as rows at.. (dropping anything after `at`); False if they don't fit the schema."""
+        info = self.schema["columns"]
+        if list(feats.columns) != list(info):
+            return False
+        enc = {}
+        for c in feats.columns:
+            enc[c] = self._encode(feats[c], info[c])
+            if enc[c] is None:
+                return False
+        for path, a in [(self._path("index.i8"), _ns_index(feats.index))] + [(self._col_path(c), enc[c]) for c in feats.columns]:
+            a = np.ascontiguousarray(a, dtype=np.dtype(a.dtype))
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.truncate(at * a.itemsize)
+                f.seek(at * a.itemsize)
+                f.write(a.tobytes())
+        self._save_schema({**self.schema, "rows": at + len(feats)})
+        return True
@@ -1,22 +1,142 @@
-import fitz, json
+import fitz, json, os, time, hashlib, argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from uuid import uuid4
+
+RAW_DIR  = Path("data/raw_pdfs")
+OUT_DIR  = Path("kb/chunks")
+MANIFEST = OUT_DIR / "_manifest.json"   # pdf name -> sha256 of the last ingested version
+
 
 def chunk_text(text, size=800, overlap=150):
-    step = size - overlap
-    for i in range(0, len(text), step):
-        yield text[i:i+size]
+    """
+    ~size-char windows that break on whitespace, carrying ~overlap chars of
+    trailing words into the next window. Words are never split.
+    """
+    words = text.split()
+    chunk, n = [], 0
+    for w in words:
+        if chunk and n + len(w) + 1 > size:
+            yield " ".join(chunk)
+            keep, k = [], 0
+            for prev in reversed(chunk):
+                if k + len(prev) + 1 > overlap:
+                    break
+                keep.append(prev); k += len(prev) + 1
+            chunk, n = keep[::-1], k
+        chunk.append(w); n += len(w) + 1
+    if chunk:
+        yield " ".join(chunk)
+
+
+def file_hash(path, block=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while b := f.read(block):
+            h.update(b)
+    return h.hexdigest()
+
+
+def extract_pages(pdf_path, start, stop):
+    """Worker: chunk pages [start, stop) of one PDF. Chunks never cross a page."""
+    rows = []
+    with fitz.open(pdf_path) as doc:
+        for pno in range(start, stop):
+            txt = doc[pno].get_text("text")
+            for ch in chunk_text(txt):
+                rows.append({"source": Path(pdf_path).name, "page": pno + 1, "text": ch})
+    return rows, stop - start
+
+
+def plan(pdfs, manifest, force=False, pages_per_task=16):
+    """(pdf, hash, [(start, stop), ...]) for every PDF that changed since the last run."""
+    jobs = []
+    for pdf in pdfs:
+        digest = file_hash(pdf)
+        if not force and manifest.get(pdf.name) == digest and (OUT_DIR / f"{pdf.stem}.jsonl").exists():
+            print(f"Unchanged {pdf.name}, skip")
+            continue
+        with fitz.open(pdf) as doc:
+            n = doc.page_count
+        jobs.append((pdf, digest, [(s, min(s + pages_per_task, n)) for s in range(0, n, pages_per_task)]))
+    return jobs
+
+
+def publish(pdf, digest, manifest):
+    """Move a finished PDF's JSONL into place and record its hash."""
+    os.replace(OUT_DIR / f"{pdf.stem}.jsonl.tmp", OUT_DIR / f"{pdf.stem}.jsonl")
+    manifest[pdf.name] = digest
+    MANIFEST.write_text(json.dumps(manifest, indent=2))
+
+
+def ingest(jobs, manifest, workers=None):
+    """
+    Fan page ranges out to a process pool and stream the chunks to each PDF's
+    JSONL in page order. At most 2x workers ranges are in flight, so memory
+    stays bounded no matter how large a document is.
+    """
+    workers = workers or os.cpu_count()
+    tasks = [(pdf, s, e) for pdf, _, ranges in jobs for s, e in ranges]
+    total_pages, t0 = 0, time.perf_counter()
+    writers, remaining = {}, {pdf: len(ranges) for pdf, _, ranges in jobs}
+    digests = {pdf: d for pdf, d, _ in jobs}
+
+    # PDFs without pages have no ranges to wait for: publish an empty JSONL now
+    for pdf, digest, ranges in jobs:
+        if not ranges:
+            open(OUT_DIR / f"{pdf.stem}.jsonl.tmp", "w", encoding="utf-8").close()
+            publish(pdf, digest, manifest)
+            print(f"Processed {pdf.name} (no pages)")
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending, it = deque(), iter(tasks)
+        for pdf, s, e in it:
+            pending.append((pdf, ex.submit(extract_pages, str(pdf), s, e)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            pdf, fut = pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt[0], ex.submit(extract_pages, str(nxt[0]), nxt[1], nxt[2])))
+
+            rows, n_pages = fut.result()
+            if pdf not in writers:
+                writers[pdf] = open(OUT_DIR / f"{pdf.stem}.jsonl.tmp", "w", encoding="utf-8")
+            w = writers[pdf]
+            for r in rows:
+                w.write(json.dumps(r) + "\n")
+            total_pages += n_pages
+
+            remaining[pdf] -= 1
+            if remaining[pdf] == 0:   # PDF complete: publish its JSONL
+                w.close()
+                publish(pdf, digests[pdf], manifest)
+                elapsed = time.perf_counter() - t0
+                print(f"Processed {pdf.name} ({total_pages / max(elapsed, 1e-9):.1f} pages/s so far)")
+
+    elapsed = time.perf_counter() - t0
+    return total_pages, elapsed
+
 
 if __name__ == "__main__":
-    raw = Path("data/raw_pdfs"); out = Path("kb/chunks")
-    out.mkdir(parents=True, exist_ok=True)
-    for pdf in raw.glob("*.pdf"):
-        doc = fitz.open(pdf)
-        with open(out / f"{pdf.stem}.jsonl", "w", encoding="utf-8") as w:
-            for p in doc:
-                txt = p.get_text("text")
-                for ch in chunk_text(txt):
-                    w.write(json.dumps({"source": pdf.name, "text": ch.strip()}) + "\n")
-        doc.close()
-        print(f"Processed {pdf.name}")
-    print("Done")
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Chunk PDFs into kb/chunks/*.jsonl in parallel.")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--pages-per-task", type=int, default=16)
+    ap.add_argument("--force", action="store_true", help="Re-ingest even if the PDF hash is unchanged")
+    args = ap.parse_args()
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+    pdfs = sorted(RAW_DIR.glob("*.pdf"))
+
+    # PDFs removed from data/raw_pdfs drop their chunks too
+    for name in set(manifest) - {p.name for p in pdfs}:
+        (OUT_DIR / f"{Path(name).stem}.jsonl").unlink(missing_ok=True)
+        manifest.pop(name)
+    MANIFEST.write_text(json.dumps(manifest, indent=2))
+
+    jobs = plan(pdfs, manifest, force=args.force, pages_per_task=args.pages_per_task)
+    pages, elapsed = ingest(jobs, manifest, workers=args.workers)
+    print(f"{len(jobs)} PDFs, {pages} pages in {elapsed:.1f}s ({pages / max(elapsed, 1e-9):.1f} pages/s)")
+    print("Done")
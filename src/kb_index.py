@@ -0,0 +1,88 @@
+# src/kb_index.py
+import json, os
+import faiss, numpy as np
+from pathlib import Path
+
+# index type -> default build/search params (None = sized from the corpus)
+INDEX_TYPES = {
+    "flat": {},
+    "ivf":  {"nlist": None, "nprobe": 16},
+    "hnsw": {"M": 32, "efConstruction": 80, "efSearch": 64},
+    "pq":   {"nlist": None, "m": 16, "nbits": 8, "nprobe": 16},   # IVF + product quantizer
+}
+
+
+def params_path(index_path):
+    """Build/search params are persisted next to the index: trading.faiss.json"""
+    return Path(f"{index_path}.json")
+
+
+def load_params(index_path):
+    p = params_path(index_path)
+    return json.loads(p.read_text()) if p.exists() else {"type": "flat"}
+
+
+def save_params(index_path, params):
+    tmp = Path(f"{params_path(index_path)}.tmp")
+    tmp.write_text(json.dumps(params, indent=2))
+    os.replace(tmp, params_path(index_path))
+
+
+def resolve_params(kind, n, d, **overrides):
+    """Fill defaults for an index type given corpus size n and dimension d."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}; choose from {list(INDEX_TYPES)}")
+    p = {"type": kind, **INDEX_TYPES[kind], **{k: v for k, v in overrides.items() if v is not None}}
+    if "nlist" in p and p["nlist"] is None:
+        # ~4*sqrt(n) lists, but keep >= 39 training points per list
+        p["nlist"] = int(max(1, min(4 * np.sqrt(n), n // 39)))
+    if kind == "pq":
+        while d % p["m"]:
+            p["m"] -= 1
+        # each PQ codebook needs >= 2**nbits training points
+        p["nbits"] = int(max(1, min(p["nbits"], np.floor(np.log2(max(n, 2))))))
+    return p
+
+
+def factory_string(p):
+    kind = p["type"]
+    if kind == "flat":
+        return "Flat"
+    if kind == "ivf":
+        return f"IVF{p['nlist']},Flat"
+    if kind == "hnsw":
+        return f"HNSW{p['M']}"
+    return f"IVF{p['nlist']},PQ{p['m']}x{p['nbits']}"
+
+
+def build_index(vecs, ids, p, train_size=100_000, seed=0):
+    """ID-mapped index of the requested type; trains IVF/PQ on a sample."""
+    d = vecs.shape[1]
+    index = faiss.index_factory(d, "IDMap2," + factory_string(p), faiss.METRIC_INNER_PRODUCT)
+    if p["type"] == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = p["efConstruction"]
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vecs if len(vecs) <= train_size else vecs[np.sort(rng.choice(len(vecs), train_size, replace=False))]
+        index.train(np.ascontiguousarray(sample, dtype="float32"))
+    if len(ids):
+        index.add_with_ids(np.ascontiguousarray(vecs, dtype="float32"), np.asarray(ids, dtype=np.int64))
+    apply_search_params(index, p)
+    return index
+
+
+def apply_search_params(index, p):
+    """Set nprobe / efSearch on a loaded index from its persisted params."""
+    kind = p.get("type", "flat")
+    if kind in ("ivf", "pq"):
+        faiss.extract_index_ivf(index).nprobe = int(p.get("nprobe", 16))
+    elif kind == "hnsw":
+        inner = index.index if isinstance(index, faiss.IndexIDMap) else index
+        faiss.downcast_index(inner).hnsw.efSearch = int(p.get("efSearch", 64))
+    return index
+
+
+def same_build(a, b):
+    """True if two param dicts describe the same trained structure (search params may differ)."""
+    keys = {"type", "nlist", "m", "nbits", "M", "efConstruction"}
+    return {k: a.get(k) for k in keys} == {k: b.get(k) for k in keys}
@@ -0,0 +1,112 @@
+# src/llm_cache.py
+import json, time, hashlib, threading
+from collections import OrderedDict, deque
+
+
+def cache_key(model, messages, kb_context="", snapshot=""):
+    """sha256 over everything that determines the answer."""
+    blob = json.dumps({"model": model, "messages": messages, "kb": kb_context, "snapshot": snapshot},
+                      sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU of completed replies with a TTL and an entry limit."""
+
+    def __init__(self, ttl=3600, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._d = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._d.get(key)
+            if item is None or time.time() - item[0] > self.ttl:
+                self._d.pop(key, None)
+                self.misses += 1
+                return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._d[key] = (time.time(), value)
+            self._d.move_to_end(key)
+            while len(self._d) > self.max_entries:
+                self._d.popitem(last=False)
+
+
+class UsageLog:
+    """Per-request token and latency accounting (most recent `maxlen` requests)."""
+
+    def __init__(self, maxlen=500):
+        self.records = deque(maxlen=maxlen)
+
+    def add(self, **rec):
+        self.records.append(rec)
+
+    def summary(self):
+        recs = list(self.records)
+        live = [r for r in recs if not r["cached"]]
+        return {
+            "requests": len(recs),
+            "cached": len(recs) - len(live),
+            "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in live),
+            "completion_tokens": sum(r.get("completion_tokens") or 0 for r in live),
+            "avg_first_token_ms": round(sum(r["first_token_ms"] for r in live) / len(live), 1) if live else None,
+            "avg_total_ms": round(sum(r["total_ms"] for r in live) / len(live), 1) if live else None,
+        }
+
+
+def stream_chat(client, model, messages, cache=None, key=None, usage=None):
+    """
+    Yield reply text as it arrives from an OpenAI-compatible endpoint.
+    A cache hit yields the stored reply at once; a completed stream is stored.
+    Token counts come from the final usage chunk when the server sends one.
+    """
+    t0 = time.perf_counter()
+    if cache is not None and key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            if usage is not None:
+                ms = (time.perf_counter() - t0) * 1000
+                usage.add(cached=True, model=model, first_token_ms=ms, total_ms=ms)
+            yield hit
+            return
+
+    parts, first, tok = [], None, {}
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True,
+                                            stream_options={"include_usage": True})
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            tok = {"prompt_tokens": chunk.usage.prompt_tokens, "completion_tokens": chunk.usage.completion_tokens}
+        if not chunk.choices:
+            continue
+        piece = chunk.choices[0].delta.content
+        if piece:
+            if first is None:
+                first = time.perf_counter()
+            parts.append(piece)
+            yield piece
+
+    reply = "".join(parts)
+    if cache is not None and key is not None and reply:
+        cache.put(key, reply)
+    if usage is not None:
+        end = time.perf_counter()
+        usage.add(cached=False, model=model, first_token_ms=((first or end) - t0) * 1000,
+                  total_ms=(end - t0) * 1000, **tok)
+
+
+_cache, _usage = None, None
+
+
+def get_cache():
+    """Process-wide reply cache and usage log (shared across Streamlit reruns/sessions)."""
+    global _cache, _usage
+    if _cache is None:
+        _cache, _usage = ResponseCache(), UsageLog()
+    return _cache, _usage
@@ -0,0 +1,96 @@
+# src/meta_store.py
+import json, sqlite3, threading
+from pathlib import Path
+
+STORE_PATH = "kb/vectors/meta.sqlite"
+JSONL_PATH = "kb/vectors/meta.jsonl"
+_COLS = ("source", "page", "text")
+
+
+class MetaStore:
+    """
+    Chunk metadata keyed by vector id in SQLite: O(1) lookups by primary key
+    without loading the corpus. Writers update in one transaction, so readers
+    always see a consistent snapshot (WAL mode).
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS chunks ("
+                          "id INTEGER PRIMARY KEY, source TEXT, page INTEGER, text TEXT, extra TEXT)")
+
+    def __len__(self):
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get_many(self, ids):
+        """{id: row dict} for the ids that exist."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        q = f"SELECT id, source, page, text, extra FROM chunks WHERE id IN ({','.join('?' * len(ids))})"
+        with self._lock:
+            rows = self._con.execute(q, ids).fetchall()
+        out = {}
+        for i, source, page, text, extra in rows:
+            r = {"id": i, "source": source, "text": text}
+            if page is not None:
+                r["page"] = page
+            if extra:
+                r.update(json.loads(extra))
+            out[i] = r
+        return out
+
+    def ids(self):
+        with self._lock:
+            return {r[0] for r in self._con.execute("SELECT id FROM chunks")}
+
+    def sync(self, rows):
+        """Make the store hold exactly `rows` (dicts with 'id'): delete dropped ids, insert new ones."""
+        want = {int(r["id"]): r for r in rows}
+        have = self.ids()
+        gone = [(i,) for i in have - want.keys()]
+        new = [_pack(want[i]) for i in want.keys() - have]
+        with self._lock, self._con:
+            self._con.executemany("DELETE FROM chunks WHERE id = ?", gone)
+            self._con.executemany("INSERT INTO chunks VALUES (?,?,?,?,?)", new)
+        return len(new), len(gone)
+
+    def close(self):
+        self._con.close()
+
+
+def _pack(r):
+    extra = {k: v for k, v in r.items() if k not in ("id", *_COLS)}
+    return (int(r["id"]), r.get("source"), r.get("page"), r.get("text"), json.dumps(extra) if extra else None)
+
+
+def migrate_jsonl(jsonl_path=JSONL_PATH, store_path=STORE_PATH, batch=10_000):
+    """
+    One-off migration of meta.jsonl into the store, streamed in batches.
+    Rows without an 'id' get their line number (legacy positional index).
+    """
+    store = MetaStore(store_path)
+    n = 0
+    with open(jsonl_path, encoding="utf-8") as f, store._lock, store._con:
+        store._con.execute("DELETE FROM chunks")
+        buf = []
+        for pos, line in enumerate(f):
+            r = json.loads(line)
+            r.setdefault("id", pos)
+            buf.append(_pack(r))
+            if len(buf) >= batch:
+                store._con.executemany("INSERT OR REPLACE INTO chunks VALUES (?,?,?,?,?)", buf)
+                n += len(buf); buf = []
+        store._con.executemany("INSERT OR REPLACE INTO chunks VALUES (?,?,?,?,?)", buf)
+        n += len(buf)
+    return store, n
+
+
+if __name__ == "__main__":
+    _, n = migrate_jsonl()
+    print(f"Migrated {n} rows from {JSONL_PATH} to {STORE_PATH}")
@@ -0,0 +1,186 @@
+# src/metrics.py
+"""
+Small in-process metrics for the alert pipeline: timed spans, counters and
+fixed-bucket histograms. Exported as one JSON line per run and as a
+Prometheus text-format file (for node_exporter's textfile collector).
+
+Disabled metrics are a NullMetrics whose methods do nothing, so the
+instrumented code pays one attribute lookup and call per span.
+"""
+import os, json, time, bisect
+from contextlib import contextmanager, nullcontext
+
+STAGE_BUCKETS   = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+PREFIX = "usdmxn_alert_"
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1   # le-bucket
+        self.sum += v
+        self.count += 1
+
+    def to_dict(self):
+        return {"buckets": self.buckets, "counts": self.counts, "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(d["buckets"])
+        h.counts, h.sum, h.count = list(d["counts"]), d["sum"], d["count"]
+        return h
+
+
+class Metrics:
+    """
+    Counters and histograms accumulate for the life of the object (and across
+    processes via load/save of a state file); spans of the current run are
+    also kept separately for the per-run JSON line.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.counters = {}
+        self.hists = {}
+        self.run_spans = {}
+        self.run_counts = {}
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.run_spans[stage] = self.run_spans.get(stage, 0.0) + dt
+            self.observe("stage_seconds", dt, STAGE_BUCKETS, stage=stage)
+
+    def inc(self, name, n=1, **labels):
+        k = _key(name, labels)
+        self.counters[k] = self.counters.get(k, 0) + n
+        rk = name if not labels else f"{name}{{{','.join(f'{a}={b}' for a, b in sorted(labels.items()))}}}"
+        self.run_counts[rk] = self.run_counts.get(rk, 0) + n
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        k = _key(name, labels)
+        h = self.hists.get(k)
+        if h is None:
+            h = self.hists[k] = Histogram(buckets)
+        h.observe(value)
+
+    # ---- export ----
+    def end_run(self, jsonl_path=None, **fields):
+        """Append this run's spans/counts (plus any extra fields) as one JSON line, then reset them."""
+        rec = {"t": time.time(), **fields, "spans_s": {k: round(v, 6) for k, v in self.run_spans.items()},
+               "counts": self.run_counts}
+        if jsonl_path:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+            with open(jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, default=_json_default) + "\n")
+        self.run_spans, self.run_counts = {}, {}
+        return rec
+
+    def prometheus(self):
+        lines, seen = [], set()
+        for (name, labels), v in sorted(self.counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                seen.add(name)
+            lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {v}")
+        for (name, labels), h in sorted(self.hists.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                seen.add(name)
+            cum = 0
+            for b, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                cum += c
+                lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels + (('le', str(b)),))} {cum}")
+            lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)   # the collector must never read a half-written file
+
+    # ---- persistence (one-shot cron runs keep cumulative counters) ----
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                st = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self
+        self.counters = {_key(c["name"], c["labels"]): c["value"] for c in st.get("counters", [])}
+        self.hists = {_key(h["name"], h["labels"]): Histogram.from_dict(h) for h in st.get("hists", [])}
+        return self
+
+    def save(self, path):
+        st = {
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()],
+            "hists": [{"name": n, "labels": dict(l), **h.to_dict()} for (n, l), h in self.hists.items()],
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(st, f)
+        os.replace(tmp, path)
+
+
+def _json_default(o):
+    # numpy scalars -> python, Timestamps etc. as text
+    return o.item() if hasattr(o, "item") else str(o)
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+_NULL_SPAN = nullcontext()
+
+
+class NullMetrics:
+    """Same interface, does nothing."""
+    enabled = False
+
+    def span(self, stage):
+        return _NULL_SPAN
+
+    def inc(self, name, n=1, **labels):
+        pass
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        pass
+
+    def end_run(self, jsonl_path=None, **fields):
+        return None
+
+    def write_prometheus(self, path):
+        pass
+
+    def load(self, path):
+        return self
+
+    def save(self, path):
+        pass
+
+
+def get_metrics(enabled=None):
+    """Metrics() if enabled (or ALERT_METRICS=1 in the environment), else the no-op version."""
+    if enabled is None:
+        enabled = os.getenv("ALERT_METRICS", "0") not in ("", "0", "false", "False")
+    return Metrics() if enabled else NullMetrics()
@@ -1,6 +1,8 @@
 # src/plot_trade.py
+import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from downsample import downsample
 
 def _scatter(ax, df, price_col, label, marker):
     """Plot markers only if there are rows."""
@@ -10,18 +12,21 @@ def _scatter(ax, df, price_col, label, marker):
     y = df[price_col].to_numpy(dtype=float)
     ax.scatter(x, y, marker=marker, s=60, label=label)
 
-def plot_price_with_trades(df, price_col="Close", ema_col="EMA_21"):
+def plot_price_with_trades(df, price_col="Close", ema_col="EMA_21", width_px=2000):
     """
     Expects df with:
     - price_col (e.g., 'Close')
     - ema_col (e.g., 'EMA_21') if you want the overlay
     - TradeAction in {'BUY','SELL','EXIT-TP','EXIT-SL', None}
     Index must be DatetimeIndex (ns resolution is fine).
+    Long histories are min/max-downsampled to ~width_px columns; every trade
+    marker is kept.
     """
     # Ensure DatetimeIndex
     if not df.index.inferred_type.startswith("datetime"):
         df = df.copy()
         df.index = pd.to_datetime(df.index)
+    df = downsample(df, width_px, price_col)
 
     fig, ax = plt.subplots(figsize=(12, 5))
 
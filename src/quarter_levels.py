@@ -0,0 +1,138 @@
+# src/quarter_levels.py
+"""
+Quarters Theory levels for any instrument.
+
+A grid level every `size_pips` pips (the 00/25/50/75 levels for size 25).
+Four grid steps make one "whole"; QG says which quarter of the whole the
+price is in (Q1 = lowest). Levels live in a precomputed sorted array, so
+nearest/above/below are one searchsorted for a whole column and an O(log n)
+bisect for a live tick.
+"""
+from bisect import bisect_right
+import numpy as np
+import pandas as pd
+
+QG_LABELS = ["Q1", "Q2", "Q3", "Q4"]
+QG_DTYPE = pd.CategoricalDtype(QG_LABELS)
+MAX_LEVELS = 200_000       # cap on the cached level array (a 25-pip grid up to ~500 at 1e-4)
+
+
+class QuarterGrid:
+    """
+    Levels for one (size_pips, pip_scale). The level array covers [lo, hi]
+    and grows on demand when a price falls outside it.
+    """
+
+    def __init__(self, size_pips=25, pip_scale=0.0001, lo=None, hi=None):
+        self.size_pips = float(size_pips)
+        self.pip_scale = float(pip_scale)
+        self.step = self.size_pips * self.pip_scale
+        self._eps = self.step * 1e-9          # float slack so 18.25 sits *on* its level
+        self._k0 = 0
+        self.levels = np.empty(0)
+        if lo is not None:
+            self._cover(lo, hi if hi is not None else lo)
+
+    def _cover(self, lo, hi):
+        """Grow the level array to [lo, hi]; False (array unchanged) if that would exceed MAX_LEVELS."""
+        k_lo = int(np.floor(lo / self.step)) - 1
+        k_hi = int(np.ceil(hi / self.step)) + 1
+        if len(self.levels):
+            if k_lo >= self._k0 and k_hi <= self._k0 + len(self.levels) - 1:
+                return True
+            k_lo = min(k_lo, self._k0)
+            k_hi = max(k_hi, self._k0 + len(self.levels) - 1)
+        if k_hi - k_lo + 1 > MAX_LEVELS:
+            return False           # a bad tick; those prices use the arithmetic fallback
+        self._k0 = k_lo
+        # k * step (not a running sum) keeps every level exactly reproducible
+        self.levels = np.arange(k_lo, k_hi + 1) * self.step
+        self._levels_list = self.levels.tolist()
+        return True
+
+    # ---- batch ----
+    def codes(self, price):
+        """int8 quarter index 0..3 (Q1..Q4) of each price within its whole; -1 for NaN/inf."""
+        p = np.asarray(price, dtype=float)
+        ok = np.isfinite(p)
+        k = np.floor((np.where(ok, p, 0.0) + self._eps) / self.step)
+        return np.where(ok, np.mod(k, 4), -1).astype(np.int8)
+
+    def categorical(self, price, name="QG"):
+        idx = price.index if isinstance(price, pd.Series) else None
+        return pd.Series(pd.Categorical.from_codes(self.codes(price), dtype=QG_DTYPE), index=idx, name=name)
+
+    def frame(self, price, prefix="QG"):
+        """
+        Per-price quarter code plus levels:
+        {prefix} categorical, _Below / _Above (level at-or-below / strictly above),
+        _Nearest, _Offset (signed price - nearest, in pips), _Dir (+1 above the
+        nearest level, -1 below, 0 on it). Non-finite prices (e.g. the bar still
+        forming) give a missing QG and NaN everywhere else.
+        """
+        p = np.asarray(price, dtype=float)
+        if len(p) == 0:
+            return pd.DataFrame(index=getattr(price, "index", None))
+        ok = np.isfinite(p)
+        below = np.full(len(p), np.nan)
+        above = np.full(len(p), np.nan)
+        if ok.any():
+            q = p[ok]
+            covered = self._cover(q.min(), q.max())
+            i = np.searchsorted(self.levels, q + self._eps, side="right")
+            inside = (i > 0) & (i < len(self.levels)) if covered else np.zeros(len(q), dtype=bool)
+            b = np.floor((q + self._eps) / self.step) * self.step      # fallback off the cached array
+            b[inside] = self.levels[i[inside] - 1]
+            a = b + self.step
+            a[inside] = self.levels[i[inside]]
+            below[ok], above[ok] = b, a
+        nearest = np.where(p - below <= above - p, below, above)
+        nearest[~ok] = np.nan
+        dist = (p - nearest) / self.pip_scale
+        dist[np.abs(dist) < 1e-6] = 0.0
+        return pd.DataFrame({
+            prefix: pd.Categorical.from_codes(self.codes(p), dtype=QG_DTYPE),
+            f"{prefix}_Below": below,
+            f"{prefix}_Above": above,
+            f"{prefix}_Nearest": nearest,
+            f"{prefix}_Offset": dist,
+            f"{prefix}_Dir": np.sign(dist),       # float so NaN rows fit
+        }, index=getattr(price, "index", None))
+
+    def dist_pips(self, price):
+        """Absolute distance to the nearest level, in pips (vectorized, no level array needed)."""
+        p = np.asarray(price, dtype=float)
+        r = np.mod(p, self.step)
+        return np.minimum(r, self.step - r) / self.pip_scale
+
+    # ---- live ----
+    def lookup(self, price):
+        """One price -> dict with the same fields as frame(), without building arrays."""
+        price = float(price)
+        if not np.isfinite(price):
+            return {"QG": None, "Below": np.nan, "Above": np.nan, "Nearest": np.nan, "Offset": np.nan, "Dir": np.nan}
+        if self._cover(price, price):
+            i = bisect_right(self._levels_list, price + self._eps)
+            below, above = self._levels_list[i - 1], self._levels_list[i]
+        else:
+            below = float(np.floor((price + self._eps) / self.step) * self.step)
+            above = below + self.step
+        nearest = below if price - below <= above - price else above
+        dist = (price - nearest) / self.pip_scale
+        if abs(dist) < 1e-6:
+            dist = 0.0
+        return {"QG": QG_LABELS[int(np.floor((price + self._eps) / self.step)) % 4],
+                "Below": below, "Above": above, "Nearest": nearest,
+                "Offset": dist, "Dir": (dist > 0) - (dist < 0)}
+
+
+_grids = {}
+
+
+def get_grid(size_pips=25, pip_scale=0.0001):
+    """Shared grid per (size, scale), so the level array is built once per process."""
+    key = (float(size_pips), float(pip_scale))
+    g = _grids.get(key)
+    if g is None:
+        g = _grids[key] = QuarterGrid(*key)
+    return g
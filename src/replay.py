@@ -0,0 +1,167 @@
+# src/replay.py
+"""
+Drive the analyze_and_alert pipeline offline: stored or synthetic bars are
+released one bar close at a time on a simulated clock, fetched through a stub
+provider, and alerts land in a stub mail sink. Reports sustained throughput
+and alert latency.
+
+    python src/replay.py --days 14 --replay-days 7 --speed 0        # as fast as possible
+    python src/replay.py --bars data/market/USDMXN_M15.csv --speed 3600
+"""
+import os, json, time, argparse, tempfile, contextlib, io
+from argparse import Namespace
+import numpy as np
+import pandas as pd
+import analyze_and_alert as pipeline
+from synth_market import generate
+from metrics import Metrics
+
+
+class SimClock:
+    """
+    Simulated UTC time. At speed N, one simulated second takes 1/N real
+    seconds; speed 0 means don't wait at all.
+    """
+
+    def __init__(self, start, speed=0.0):
+        self.now_ = pd.Timestamp(start)
+        self.speed = speed
+        self._sim0, self._real0 = self.now_, time.perf_counter()
+
+    def __call__(self):
+        return self.now_.to_pydatetime()
+
+    def real_time_of(self, t):
+        """perf_counter() value at which sim time t is due."""
+        if not self.speed:
+            return time.perf_counter()
+        return self._real0 + (pd.Timestamp(t) - self._sim0).total_seconds() / self.speed
+
+    def advance_to(self, t):
+        """Sleep (scaled) until t is due, then move the clock there. Returns the due real time."""
+        due = self.real_time_of(t)
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self.now_ = pd.Timestamp(t)
+        return due
+
+
+class StubProvider:
+    """fetch(period, interval) like fetch_usdmxn_period, serving only the bars already closed at clock()."""
+
+    def __init__(self, bars, clock, bar=pd.Timedelta("15min")):
+        self.bars = bars
+        self.clock = clock
+        self.bar = bar
+        self.calls = 0
+
+    def __call__(self, period="7d", interval="15m"):
+        self.calls += 1
+        now = pd.Timestamp(self.clock())
+        end = self.bars.index.searchsorted(now - self.bar, side="right")
+        start = self.bars.index.searchsorted(now - pd.Timedelta(period), side="left")
+        return self.bars.iloc[start:end][["Open", "High", "Low", "Close", "Volume"]]
+
+
+class StubMailer:
+    """send(subject, body, attachment) sink that records what would have been mailed, and when."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+
+    def __call__(self, subject, body, attachment=None):
+        self.sent.append({"subject": subject, "attachment": attachment,
+                          "sim_time": pd.Timestamp(self.clock()), "real_t": time.perf_counter()})
+
+
+def replay(bars, replay_from, speed=0.0, out_dir=None, quiet=True, spec_path=None):
+    """
+    Release every bar at or after replay_from at its close time and run the
+    pipeline once per bar. Bars before replay_from are history only.
+    """
+    times = bars.index[bars.index >= pd.Timestamp(replay_from)]
+    bar = bars.index.to_series().diff().min()
+    clock = SimClock(times[0], speed)
+    provider, mailer = StubProvider(bars, clock, bar), StubMailer(clock)
+
+    with contextlib.ExitStack() as stack:
+        out_dir = out_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        for sub in ("signals", "market", "images", "alerts", "stream"):
+            os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+        out = {
+            "signals":    os.path.join(out_dir, "signals", "signals.csv"),
+            "bars":       os.path.join(out_dir, "market", "bars.csv"),
+            "chart":      os.path.join(out_dir, "images", "chart.png"),
+            "last_alert": os.path.join(out_dir, "alerts", "last_alert.json"),
+            "journal":    os.path.join(out_dir, "stream", "events.jsonl"),
+            "features":   os.path.join(out_dir, "features"),
+        }
+        metrics = Metrics()
+        metrics_log = os.path.join(out_dir, "metrics", "alert_runs.jsonl")
+        args = Namespace(test=False, signal=None)
+        ticks, alerts = [], []
+        t_start = time.perf_counter()
+        for t in times:
+            due = clock.advance_to(t + bar)          # bar t is complete at its close
+            n_sent = len(mailer.sent)
+            with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                res = pipeline.run(args, fetch=provider, send=mailer, clock=clock, out=out, spec_path=spec_path,
+                                   metrics=metrics)
+            metrics.end_run(metrics_log, **(res or {}))
+            done = time.perf_counter()
+            ticks.append(done - due)
+            if len(mailer.sent) > n_sent:
+                m = mailer.sent[-1]
+                alerts.append({"bar": str(t), "subject": m["subject"], "latency_s": m["real_t"] - due})
+        wall = time.perf_counter() - t_start
+        metrics.write_prometheus(os.path.join(out_dir, "metrics", "alert.prom"))
+
+    lat = [a["latency_s"] for a in alerts]
+    return {
+        "bars": len(times),
+        "speed": speed or "max",
+        "wall_s": round(wall, 3),
+        "bars_per_s": round(len(times) / wall, 2),
+        "sim_days": round((times[-1] - times[0]) / pd.Timedelta("1D"), 2),
+        "tick_p50_ms": round(float(np.percentile(ticks, 50)) * 1000, 1),
+        "tick_p99_ms": round(float(np.percentile(ticks, 99)) * 1000, 1),
+        "alerts": len(alerts),
+        "alert_latency_p50_ms": round(float(np.percentile(lat, 50)) * 1000, 1) if lat else None,
+        "alert_latency_max_ms": round(max(lat) * 1000, 1) if lat else None,
+        # mean seconds per pipeline stage, from the metrics histograms
+        "stage_mean_ms": {dict(labels)["stage"]: round(h.sum / h.count * 1000, 2)
+                          for (name, labels), h in metrics.hists.items() if name == "stage_seconds"},
+        "alert_log": alerts,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay bars through the alert pipeline on a simulated clock")
+    ap.add_argument("--bars", help="CSV with Datetime,Open,High,Low,Close[,Volume]; synthetic if omitted")
+    ap.add_argument("--days", type=float, default=14, help="Synthetic history length")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--replay-days", type=float, default=7, help="Replay the last N days (earlier bars are history)")
+    ap.add_argument("--speed", type=float, default=0, help="N x real time; 0 = as fast as possible")
+    ap.add_argument("--spec", help="StrategySpec JSON (default: the pipeline's cached spec)")
+    ap.add_argument("--out-dir", help="Keep pipeline outputs here instead of a temp dir")
+    ap.add_argument("--report", default="outputs/replay/report.json")
+    ap.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = ap.parse_args()
+
+    if args.bars:
+        bars = pd.read_csv(args.bars, parse_dates=["Datetime"]).set_index("Datetime").sort_index()
+        bars.index = bars.index.tz_localize("UTC") if bars.index.tz is None else bars.index.tz_convert("UTC")
+        if "Volume" not in bars.columns:
+            bars["Volume"] = 0
+    else:
+        bars = generate(days=args.days, seed=args.seed)
+    replay_from = bars.index[-1] - pd.Timedelta(days=args.replay_days)
+
+    report = replay(bars, replay_from, args.speed, args.out_dir, quiet=not args.verbose, spec_path=args.spec)
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if k != "alert_log"}, indent=2))
+    print(f"Wrote {args.report}")
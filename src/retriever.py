@@ -0,0 +1,138 @@
+# src/retriever.py
+import os, time, threading
+from collections import OrderedDict, deque
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from kb_index import params_path, load_params, apply_search_params
+from meta_store import MetaStore, migrate_jsonl, STORE_PATH
+from dedup import collapse_hits
+
+INDEX_PATH = "kb/vectors/trading.faiss"
+META_PATH  = "kb/vectors/meta.jsonl"
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def _file_sig(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Retriever:
+    """
+    Warm FAISS retriever: the embedding model and index are loaded once per
+    process and the index is reloaded only when its files on disk change
+    (checked with a cheap stat per search). Chunk metadata is fetched by id
+    from the SQLite MetaStore, never loaded whole. Query embeddings are kept
+    in an LRU cache and per-query latencies are tracked for p50/p99.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, meta_path=META_PATH, store_path=STORE_PATH,
+                 model_name=MODEL_NAME, cache_size=1024, stats_window=1000):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.store_path = store_path
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._model = None
+        self._index = None
+        self._metas = None
+        self._sig = None
+        self._cache = OrderedDict()
+        self._lat = deque(maxlen=stats_window)
+        self.counters = {"queries": 0, "cache_hits": 0, "cache_misses": 0, "reloads": 0}
+
+    # ---- loading ----
+    def model(self):
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _maybe_reload(self):
+        pp = params_path(self.index_path)
+        sig = (_file_sig(self.index_path), _file_sig(pp) if pp.exists() else None)
+        if self._metas is None:
+            # metadata is looked up by id in SQLite; migrate a bare meta.jsonl once
+            if os.path.exists(self.store_path) or not os.path.exists(self.meta_path):
+                self._metas = MetaStore(self.store_path)
+            else:
+                self._metas, _ = migrate_jsonl(self.meta_path, self.store_path)
+        if sig == self._sig:
+            return
+        self._index = apply_search_params(faiss.read_index(self.index_path), load_params(self.index_path))
+        self._sig = sig
+        self.counters["reloads"] += 1
+
+    # ---- embeddings ----
+    def embed(self, queries):
+        """Normalized float32 embeddings for queries, served from the LRU cache when possible."""
+        with self._lock:   # shared cache and counters (re-entered from search)
+            out = [None] * len(queries)
+            misses = []
+            for i, q in enumerate(queries):
+                v = self._cache.get(q)
+                if v is None:
+                    misses.append(i)
+                else:
+                    self._cache.move_to_end(q)
+                    out[i] = v
+            self.counters["cache_hits"] += len(queries) - len(misses)
+            self.counters["cache_misses"] += len(misses)
+
+            if misses:
+                vecs = self.model().encode([queries[i] for i in misses], normalize_embeddings=True).astype("float32")
+                for i, v in zip(misses, vecs):
+                    out[i] = v
+                    self._cache[queries[i]] = v
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return np.vstack(out)
+
+    # ---- search ----
+    def search(self, queries, k=5, collapse=True, overfetch=2):
+        """
+        Batch search. Returns one list of metadata rows (dicts with at least
+        'text' and 'source') per query, best first. With collapse, near-duplicate
+        hits (SimHash) are folded into the best-ranked one; k*overfetch
+        candidates are fetched so k distinct hits usually remain.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        t0 = time.perf_counter()
+        with self._lock:
+            self._maybe_reload()
+            q = self.embed(queries)
+            _, I = self._index.search(q, k * overfetch if collapse else k)
+        metas = self._metas.get_many({int(i) for i in I.ravel() if i != -1})
+        hits = [[metas[i] for i in row if i in metas] for row in I]
+        hits = [collapse_hits(h, k) if collapse else h for h in hits]
+
+        per_query = (time.perf_counter() - t0) / max(len(queries), 1)
+        with self._lock:   # one instance serves every session thread
+            self._lat.extend([per_query] * len(queries))
+            self.counters["queries"] += len(queries)
+        return hits
+
+    def stats(self):
+        """Counters plus p50/p99 per-query latency (ms) over the recent window."""
+        with self._lock:
+            lat = np.array(self._lat) * 1000 if self._lat else np.array([np.nan])
+            counters = dict(self.counters)
+        return {**counters,
+                "p50_ms": float(np.percentile(lat, 50)),
+                "p99_ms": float(np.percentile(lat, 99))}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_retriever():
+    """Process-wide warm retriever."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Retriever()
+        return _default
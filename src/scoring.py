@@ -0,0 +1,76 @@
+# src/scoring.py
+import numpy as np
+import pandas as pd
+from spec_schema import ScoringRule
+
+# component name -> ScoringRule weight field
+COMPONENTS = {
+    "Sweep":   "sweep",
+    "Quarter": "quarter",
+    "RSI":     "rsi_extreme",
+    "Trend":   "ema_trend",
+    "H1Slope": "h1_slope",
+    "ATRBand": "atr_band",
+}
+
+
+def _col(df, name, default):
+    """Column as a float array, or a constant array if the feature is missing."""
+    if name in df.columns:
+        return df[name].to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
+
+
+def confluence_masks(df, rule: ScoringRule = None):
+    """
+    Boolean array per confluence component, all bars at once.
+    NaN features never satisfy a condition (same as the old row-wise checks).
+    """
+    rule = rule or ScoringRule()
+    ema50, ema200 = _col(df, "EMA_50", 0), _col(df, "EMA_200", 0)
+    rsi = _col(df, "RSI_14", 0)
+    slope = _col(df, "H1_EMA_50_Slope", 0)
+    atr_pips = _col(df, "ATR_14_Pips", np.nan)
+
+    return {
+        "Sweep":   (_col(df, "SweepLo", 0) == 1) | (_col(df, "SweepHi", 0) == 1),
+        "Quarter": _col(df, "QG_DistPips", 99) <= rule.quarter_max_pips,
+        "RSI":     (rsi < rule.rsi_low) | (rsi > rule.rsi_high),
+        "Trend":   (ema50 > ema200) | (ema50 < ema200),
+        "H1Slope": ((ema50 > ema200) & (slope > 0)) | ((ema50 < ema200) & (slope < 0)),
+        "ATRBand": (atr_pips >= rule.atr_min_pips) & (atr_pips <= rule.atr_max_pips),
+    }
+
+
+def score_frame(df, rule: ScoringRule = None):
+    """
+    Per-component points (Score_<component>) and the total Score for every bar.
+    Returns a new DataFrame aligned to df.index.
+    """
+    rule = rule or ScoringRule()
+    masks = confluence_masks(df, rule)
+    weights = np.array([getattr(rule, COMPONENTS[k]) for k in masks], dtype=float)
+    pts = np.column_stack(list(masks.values())) * weights
+
+    out = pd.DataFrame(pts, index=df.index, columns=[f"Score_{k}" for k in masks])
+    total = pts.sum(axis=1)
+    if np.all(weights == np.round(weights)):   # keep integer scores for integer weights
+        out = out.astype(int)
+        total = total.astype(int)
+    out["Score"] = total
+    return out
+
+
+def add_scores(df, rule: ScoringRule = None):
+    """Attach Score and Score_<component> columns to df in place."""
+    sf = score_frame(df, rule)
+    for c in sf.columns:
+        df[c] = sf[c]
+    return df
+
+
+def filter_by_score(df, min_score):
+    """Turn BUY/SELL into FLAT where Score < min_score (df must have Signal and Score)."""
+    if min_score:
+        df.loc[df["Score"] < min_score, "Signal"] = "FLAT"
+    return df
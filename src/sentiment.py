@@ -1,41 +1,119 @@
 # src/sentiment.py
-def market_sentiment(df):
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Compact int8 codes -> labels
+PF_LABELS = {0: "No new PF", 1: "Peak Formation High (PFH)", 2: "Peak Formation Low (PFL)"}
+LEVEL_LABELS = {2: "Level 2 (Accumulation)", 3: "Level 3 (Distribution)"}
+BIAS_LABELS = {0: "Neutral bias", 1: "Bearish bias → expect downward push", 2: "Bullish bias → expect upward push"}
+BIAS_FROM_PF = np.array([0, 1, 2], dtype=np.int8)   # PFH -> bearish, PFL -> bullish
+
+
+def sentiment_series(df, window=50):
+    """
+    BTMM sentiment state for every bar in one vectorized pass.
+    Columns (all compact): PF int8, Level int8 (2/3), Bias int8, Quarter category.
+    """
+    close = df["Close"].to_numpy(dtype=float)
+    hh = df["High"].rolling(window).max().to_numpy()
+    ll = df["Low"].rolling(window).min().to_numpy()
+
+    pf = np.zeros(len(df), dtype=np.int8)
+    pf[close == ll] = 2
+    pf[close == hh] = 1   # PFH wins ties, as in the old if/elif
+
+    slope = df["Close"].rolling(window).mean().diff().to_numpy()
+    level = np.where(slope > 0, 2, 3).astype(np.int8)
+
+    qg = df["QG"] if "QG" in df.columns else pd.Series("Unknown", index=df.index)
+    return pd.DataFrame({
+        "PF": pf,
+        "Level": level,
+        "Bias": BIAS_FROM_PF[pf],
+        "Quarter": pd.Categorical(qg.astype(str)),
+    }, index=df.index)
+
+
+def describe(pf, level, bias, quarter):
+    """Decode one bar's codes into the human-readable dict used by alerts/dashboard."""
+    return {
+        "PF": PF_LABELS[int(pf)],
+        "Level": LEVEL_LABELS[int(level)],
+        "Quarter": f"Currently in {quarter}",
+        "Bias": BIAS_LABELS[int(bias)],
+    }
+
+
+def market_sentiment(df, series=None, at=-1):
     """
     Summarizes market sentiment based on BTMM concepts:
     - Peak formations (High/Low)
     - Levels (1, 2, 3)
     - Quarters Grid
+
+    Lookup into sentiment_series(). Pass a precomputed `series` to avoid any
+    recomputation; otherwise only the trailing window needed for the last bar
+    is evaluated.
+    """
+    if series is None:
+        series = sentiment_series(df.tail(51) if at == -1 else df)
+    r = series.iloc[at]
+    return describe(r["PF"], r["Level"], r["Bias"], r["Quarter"])
+
+
+class SentimentTracker:
+    """
+    Incremental sentiment for live mode: O(1) amortized per bar.
+    Rolling max/min use monotonic deques, the rolling mean a running sum.
+    Produces the same codes as sentiment_series() for the latest bar.
     """
 
-    last = df.iloc[-1]
-    sentiment = {}
-
-    # --- Peak Formation (PFH/PFL) ---
-    if last["Close"] == df["High"].rolling(50).max().iloc[-1]:
-        sentiment["PF"] = "Peak Formation High (PFH)"
-    elif last["Close"] == df["Low"].rolling(50).min().iloc[-1]:
-        sentiment["PF"] = "Peak Formation Low (PFL)"
-    else:
-        sentiment["PF"] = "No new PF"
-
-    # --- Levels (simple approximation using rolling) ---
-    swings = df["Close"].rolling(50).mean().diff().tail(3)
-    if swings.iloc[-1] > 0:
-        sentiment["Level"] = "Level 2 (Accumulation)"
-    else:
-        sentiment["Level"] = "Level 3 (Distribution)"
-
-    # --- Quarters Grid ---
-    qg = last.get("QG", "Unknown")
-    sentiment["Quarter"] = f"Currently in {qg}"
-
-    # --- Bias ---
-    if "PFL" in sentiment["PF"]:
-        bias = "Bullish bias → expect upward push"
-    elif "PFH" in sentiment["PF"]:
-        bias = "Bearish bias → expect downward push"
-    else:
-        bias = "Neutral bias"
-    sentiment["Bias"] = bias
-
-    return sentiment
+    def __init__(self, window=50):
+        self.window = window
+        self.n = 0
+        self._hi = deque()      # (i, high), highs decreasing
+        self._lo = deque()      # (i, low), lows increasing
+        self._closes = deque()
+        self._sum = 0.0
+        self._prev_mean = None
+        self.state = None
+
+    def update(self, high, low, close, qg="Unknown"):
+        i, w = self.n, self.window
+        self.n += 1
+
+        while self._hi and self._hi[-1][1] <= high:
+            self._hi.pop()
+        self._hi.append((i, high))
+        while self._hi[0][0] <= i - w:
+            self._hi.popleft()
+        while self._lo and self._lo[-1][1] >= low:
+            self._lo.pop()
+        self._lo.append((i, low))
+        while self._lo[0][0] <= i - w:
+            self._lo.popleft()
+
+        self._closes.append(close)
+        self._sum += close
+        if len(self._closes) > w:
+            self._sum -= self._closes.popleft()
+
+        pf, level = 0, 3
+        if self.n >= w:
+            if close == self._hi[0][1]:
+                pf = 1
+            elif close == self._lo[0][1]:
+                pf = 2
+            mean = self._sum / w
+            if self._prev_mean is not None and mean - self._prev_mean > 0:
+                level = 2
+            self._prev_mean = mean
+
+        self.state = (pf, level, int(BIAS_FROM_PF[pf]), qg)
+        return self.state
+
+    def sentiment(self):
+        """Latest state as the market_sentiment() dict."""
+        return describe(*self.state)
@@ -0,0 +1,147 @@
+# src/session_calendar.py
+"""
+DST-aware trading sessions.
+
+London and New York are defined in local wall-clock time, so their UTC
+hours move with BST/EDT instead of drifting by an hour twice a year:
+- Asia:   00:00 UTC until the London open
+- London: 08:00-13:00 Europe/London (ends early if NY opens first)
+- NY:     08:00-13:00 America/New_York
+- Other:  NY close until 00:00 UTC
+In summer this is exactly the old fixed-UTC split (07-11 / 12-16 UTC).
+
+Open/close instants are precomputed per date into a cached table; tagging an
+index is one searchsorted, and the live lookups index the table by day.
+"""
+import numpy as np
+import pandas as pd
+
+SESSIONS = ["Asia", "London", "NY", "Other"]
+ASIA, LONDON, NY, OTHER = range(4)
+SESSION_DTYPE = pd.CategoricalDtype(SESSIONS)
+CODES = {s: i for i, s in enumerate(SESSIONS)}
+
+WINDOWS = {                      # local open, local close, zone
+    LONDON: ("08:00", "13:00", "Europe/London"),
+    NY:     ("08:00", "13:00", "America/New_York"),
+}
+DAY_NS = 86_400 * 10**9
+SLOTS = 5                        # boundaries per day: Asia, London, (gap), NY, Other
+
+
+def _local_instants(days, hhmm, tz):
+    """UTC ns of local wall time hhmm on each date (days = tz-naive midnights)."""
+    local = (days + pd.Timedelta(f"{hhmm}:00")).tz_localize(tz)
+    return local.tz_convert("UTC").asi8
+
+
+def build_table(start, end):
+    """
+    (bounds, codes) arrays of shape (n_days, SLOTS): the UTC ns instants at
+    which a session starts on each date from start to end (inclusive), and
+    its code. Unused slots repeat the previous boundary so rows stay sorted.
+    """
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+    utc0 = days.tz_localize("UTC").asi8
+    lo_open, lo_close = (_local_instants(days, t, WINDOWS[LONDON][2]) for t in WINDOWS[LONDON][:2])
+    ny_open, ny_close = (_local_instants(days, t, WINDOWS[NY][2]) for t in WINDOWS[NY][:2])
+
+    lo_end = np.minimum(lo_close, ny_open)
+    gap = lo_end < ny_open                   # London closed before NY opened
+    bounds = np.stack([utc0, lo_open, np.where(gap, lo_end, lo_open), ny_open, ny_close], axis=1)
+    codes = np.empty_like(bounds, dtype=np.int8)
+    codes[:] = [ASIA, LONDON, LONDON, NY, OTHER]
+    codes[gap, 2] = OTHER
+    return days.tz_localize("UTC"), bounds, codes
+
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+
+class SessionCalendar:
+    """Cached table covering [first, last] day seen so far; grows a year at a time."""
+
+    def __init__(self):
+        self.days = None
+        self.bounds = self.codes = None
+        self._flat_b = self._flat_c = None
+
+    def _cover(self, t0, t1):
+        t0, t1 = _utc(t0), _utc(t1)
+        if self.days is not None and t0 >= self.days[0] and t1 < self.days[-1] + pd.Timedelta("1D"):
+            return
+        lo = pd.Timestamp(year=t0.year, month=1, day=1)
+        hi = pd.Timestamp(year=t1.year, month=12, day=31)
+        if self.days is not None:
+            lo = min(lo, self.days[0].tz_localize(None))
+            hi = max(hi, self.days[-1].tz_localize(None))
+        self.days, self.bounds, self.codes = build_table(lo, hi)
+        self._flat_b, self._flat_c = self.bounds.ravel(), self.codes.ravel()
+
+    # ---- batch ----
+    def codes_for(self, index):
+        """int8 session codes for a DatetimeIndex (naive = UTC)."""
+        idx = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+        if len(idx) == 0:
+            return np.empty(0, dtype=np.int8)
+        self._cover(idx.min(), idx.max())
+        pos = np.searchsorted(self._flat_b, idx.asi8, side="right") - 1
+        return self._flat_c[pos]
+
+    def tag(self, index):
+        return pd.Categorical.from_codes(self.codes_for(index), dtype=SESSION_DTYPE)
+
+    # ---- live ----
+    def _row(self, ts):
+        ts = _utc(ts)
+        self._cover(ts, ts)
+        return ts.value, (ts.value - self.days[0].value) // DAY_NS
+
+    def current_session(self, ts):
+        """Session name at ts: direct day-row lookup, at most SLOTS comparisons."""
+        v, d = self._row(ts)
+        b, c = self.bounds[d], self.codes[d]
+        k = SLOTS - 1
+        while b[k] > v:
+            k -= 1
+        return SESSIONS[c[k]]
+
+    def time_to_next(self, ts, session=None):
+        """
+        (name, Timedelta) until the next session change after ts, or until the
+        next open of `session` if given (e.g. "London").
+        """
+        v, d = self._row(ts)
+        want = None if session is None else CODES[session]
+        cur = CODES[self.current_session(ts)]
+        for day in (d, d + 1, d + 2):
+            if day >= len(self.days):
+                self._cover(self.days[-1] + pd.Timedelta("1D"), self.days[-1] + pd.Timedelta("2D"))
+            for b, c in zip(self.bounds[day], self.codes[day]):
+                if b > v and ((want is None and c != cur) or c == want):
+                    return SESSIONS[c], pd.Timedelta(int(b - v), "ns")
+        raise ValueError(f"No {session or 'session'} boundary within two days of {ts}")
+
+
+_calendar = SessionCalendar()
+
+
+def get_calendar():
+    return _calendar
+
+
+def add_sessions(df):
+    """Copy of df with a categorical 'Session' column (Asia/London/NY/Other), DST-aware."""
+    out = df.copy()
+    out["Session"] = _calendar.tag(df.index)
+    return out
+
+
+def current_session(ts):
+    return _calendar.current_session(ts)
+
+
+def time_to_next_session(ts, session=None):
+    return _calendar.time_to_next(ts, session)
@@ -1,11 +1,16 @@
 # src/signal_engine.py
+import ast
+import numpy as np
 import pandas as pd
-from feature_lab import rsi, atr, sma, ema, quarter_grid, add_mtf_features, add_extras, quarter_distance_pips, sweep_flags
+from feature_lab import rsi, atr, ema, add_mtf_features, add_extras
 from spec_schema import StrategySpec
+from sweeps import add_sweeps
+from quarter_levels import get_grid
 
 # Step 1: Add indicators from spec
 def add_features(df, spec):
     out = df.copy()
+    qg_dist = None
 
     for ind in spec.indicators:
         alias = ind.alias or f"{ind.name}_{ind.params.get('period','')}"
@@ -17,7 +22,12 @@ def add_features(df, spec):
         elif ind.name == "ATR":
             out[alias] = atr(out, ind.params.get("period", 14))
         elif ind.name == "QuarterGrid":
-            out[alias] = quarter_grid(out["Close"])
+            grid = get_grid(ind.params.get("size_pips", 25), ind.params.get("pip_scale", 0.0001))
+            lv = grid.frame(out["Close"], prefix=alias)
+            for c in (alias, f"{alias}_Above", f"{alias}_Below", f"{alias}_Dir"):
+                out[c] = lv[c]
+            if qg_dist is None or alias == "QG":   # QG_DistPips follows the spec's grid
+                qg_dist = lv[f"{alias}_Offset"].abs()
         elif ind.name == "SMA":
             out[alias] = out["Close"].rolling(int(ind.params.get("period", 14))).mean()
         elif ind.name == "MACD":
@@ -36,9 +46,10 @@ def add_features(df, spec):
         out["ATR_14"] = atr(out, 14)
 
     # Add extras
-    out = add_extras(out)
+    out = add_extras(out, qg_dist)
     out = add_mtf_features(out)
-    out = sweep_flags(out, lookback=20, pad_pips=5)
+    # stop hunts at several horizons; SweepHi/SweepLo stay lookback=20, pad=5
+    out = add_sweeps(out)
 
     return out
 
@@ -63,31 +74,141 @@ def safe_eval(row, expr):
         return False
 
 # Step 3: Apply entry rules → produce signals
-def signalize(df, spec: StrategySpec):
-    df = add_features(df, spec)
-    signals = []
+SIGNALS = ["FLAT", "BUY", "SELL"]
+SIGNAL_DTYPE = pd.CategoricalDtype(SIGNALS)
+_FLAT, _BUY, _SELL = range(3)
+_HIDDEN = {"Open", "High", "Low", "Volume"}   # not in safe_eval's env
+_IMPLICIT = {"ATR_14": ("ATR", 14)}            # add_features adds these when a spec doesn't
+
+
+def indicator_columns(ind):
+    """Columns add_features creates for one IndicatorDef."""
+    alias = ind.alias or f"{ind.name}_{ind.params.get('period','')}"
+    if ind.name == "QuarterGrid":
+        return [alias, f"{alias}_Above", f"{alias}_Below", f"{alias}_Dir"]
+    if ind.name == "MACD":
+        return [alias + "_line", alias + "_signal"]
+    if ind.name == "Session":
+        return []
+    return [alias]
+
+
+def condition_names(expr):
+    """Names an entry condition reads, or None if it doesn't parse."""
+    try:
+        return {n.id for n in ast.walk(ast.parse(expr, mode="eval")) if isinstance(n, ast.Name)}
+    except SyntaxError:
+        return None
 
-    for _, r in df.iterrows():
-        tag = "FLAT"
 
-        # --- BTMM Confluence Logic ---
-        if (r.get("SweepLo",0)==1) and (r.get("RSI_14",0) > 30) and (r.get("QG_DistPips",99) <= 6) and (r.get("EMA_50",0) > r.get("EMA_200",0)):
-            tag = "BUY"
-        elif (r.get("SweepHi",0)==1) and (r.get("RSI_14",0) < 70) and (r.get("QG_DistPips",99) <= 6) and (r.get("EMA_50",0) < r.get("EMA_200",0)):
-            tag = "SELL"
+def eval_condition(df, expr, visible=None):
+    """
+    Boolean array of one entry condition over every bar, same truth as
+    safe_eval row by row. Conditions naming anything outside `visible`
+    (the row's env) are never true; anything df.eval can't do vectorized
+    falls back to safe_eval per row.
+    """
+    if visible is None:
+        visible = (set(df.columns) - _HIDDEN) | {"Session"}
+    names = condition_names(expr)
+    if names is None or not names <= visible:
+        return np.zeros(len(df), dtype=bool)
+    try:
+        res = df.eval(expr, engine="python")
+        if np.isscalar(res):
+            return np.full(len(df), bool(res))
+        if isinstance(res, pd.Series) and len(res) == len(df) and res.dtype.kind in "biuf":
+            return res.to_numpy().astype(bool)     # NaN is truthy, like bool(nan)
+    except Exception:
+        pass
+    cols = [c for c in df.columns if c in names or c in ("Close", "Session")]
+    return np.array([safe_eval(r, expr) for _, r in df[cols].iterrows()], dtype=bool)
 
-        # --- Spec-driven Entries ---
-        else:
-            for er in spec.entries:
-                if safe_eval(r, er.condition):
-                    tag = "BUY" if er.side == "LONG" else "SELL"
-                    break
 
-        signals.append(tag)
+def _num(df, visible, name, default):
+    if name in visible and name in df.columns:
+        return df[name].to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
 
-    df["Signal"] = signals
+
+def signal_codes(df, spec: StrategySpec, visible=None):
+    """
+    int8 codes into SIGNALS for every bar: BTMM confluence first, then the
+    spec's entries in order (first match wins), else FLAT.
+    """
+    cols = set(df.columns) if visible is None else visible
+    sweep_lo, sweep_hi = _num(df, cols, "SweepLo", 0) == 1, _num(df, cols, "SweepHi", 0) == 1
+    rsi, near_q = _num(df, cols, "RSI_14", 0), _num(df, cols, "QG_DistPips", 99) <= 6
+    ema50, ema200 = _num(df, cols, "EMA_50", 0), _num(df, cols, "EMA_200", 0)
+
+    conds = [sweep_lo & (rsi > 30) & near_q & (ema50 > ema200),
+             sweep_hi & (rsi < 70) & near_q & (ema50 < ema200)]
+    codes = [_BUY, _SELL]
+    env = (cols - _HIDDEN) | {"Session"}
+    for er in spec.entries:
+        conds.append(eval_condition(df, er.condition, env))
+        codes.append(_BUY if er.side == "LONG" else _SELL)
+    return np.select(conds, codes, default=_FLAT).astype(np.int8)
+
+
+def signalize(df, spec: StrategySpec, features=None):
+    # features: add_features output for df computed elsewhere (e.g. FeatureStore.frame)
+    df = add_features(df, spec) if features is None else features.copy()
+    df["Signal"] = np.array(SIGNALS, dtype=object)[signal_codes(df, spec)]
     return df
 
+
+def union_spec(specs):
+    """
+    One spec whose indicators are the union of the specs' (duplicates
+    dropped). Raises ValueError if two specs use the same alias for
+    different definitions, since they can't share a column.
+    """
+    seen, inds = {}, []
+    for alias, (name, period) in _IMPLICIT.items():
+        defs = [i for s in specs for i in s.indicators if alias in indicator_columns(i)]
+        lacking = any(all(alias not in indicator_columns(i) for i in s.indicators) for s in specs)
+        if lacking and any(i.name != name or i.params.get("period") != period for i in defs):
+            raise ValueError(f"A spec redefines {alias!r}, which the others get by default; "
+                             "signalize them separately")
+    for spec in specs:
+        for ind in spec.indicators:
+            cols = tuple(indicator_columns(ind))
+            prev = seen.get(cols)
+            if prev is not None:
+                if prev.name != ind.name or prev.params != ind.params:
+                    raise ValueError(f"Specs disagree on indicator {cols[0] if cols else ind.name!r}; "
+                                     "signalize them separately")
+                continue
+            clash = [c for c in cols if any(c in k for k in seen)]
+            if clash:
+                raise ValueError(f"Specs disagree on column {clash[0]!r}; signalize them separately")
+            seen[cols] = ind
+            inds.append(ind)
+    return specs[0].model_copy(update={"name": "+".join(s.name for s in specs), "indicators": inds})
+
+
+def signalize_many(df, specs, features=None):
+    """
+    Signals for several specs over the same bars. Indicators are computed
+    once for the union of the specs, every spec's rules read that one
+    frame, and each spec only sees its own indicator columns (a condition
+    naming another spec's alias stays false, as in signalize).
+    Returns (features, signals): signals has one categorical column per
+    spec name (suffixed #2, #3.. on repeats), so memory grows with the
+    distinct features, not the number of specs.
+    """
+    union = union_spec(specs)
+    feats = add_features(df, union) if features is None else features
+    base = set(feats.columns) - {c for ind in union.indicators for c in indicator_columns(ind)}
+    signals, names = {}, {}
+    for spec in specs:
+        k = names[spec.name] = names.get(spec.name, 0) + 1
+        col = spec.name if k == 1 else f"{spec.name}#{k}"
+        own = {c for ind in spec.indicators for c in indicator_columns(ind)}
+        signals[col] = pd.Categorical.from_codes(signal_codes(feats, spec, base | own), dtype=SIGNAL_DTYPE)
+    return feats, pd.DataFrame(signals, index=feats.index)
+
 def confluence_buy(row):
     near_q = row["QG_DistPips"] <= 6  # within 6 pips of Q level
     rsi_ok = (row["RSI_14"] > 30) & (row["RSI_14_prev"] <= 30)  # rebound from oversold
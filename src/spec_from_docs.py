@@ -1,25 +1,19 @@
 # src/spec_from_docs.py
-import os, json, faiss, numpy as np
+import os, json, re, hashlib, argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
-import re
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+from pydantic import ValidationError
 from spec_schema import StrategySpec
+from retriever import get_retriever
 
 load_dotenv(override=True)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def retrieve(query, k=10):
-    metas = [json.loads(l) for l in open("kb/vectors/meta.jsonl", encoding="utf-8")]
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    q = model.encode([query], normalize_embeddings=True).astype("float32")
-    index = faiss.read_index("kb/vectors/trading.faiss")
-    _, I = index.search(q, k)
-    return "\n\n".join([metas[i]["text"] for i in I[0]])
+SPEC_PATH     = "outputs/specs/usdmxn_from_ai.json"
+LLM_CACHE_DIR = "outputs/specs/llm_cache"
+BARS_PATH     = "data/market/USDMXN_M15.csv"
+MODEL         = "gpt-4o-mini"
 
-if __name__ == "__main__":
-    ctx = retrieve("Quarters Theory and Beat the Market Maker: entries, exits, stop hunts, session timing, quarter levels")
-    system = system = """
+SYSTEM = """
 You are an expert quant.
 Return ONLY valid JSON that matches this schema (no text, no markdown, no explanations):
 
@@ -44,15 +38,46 @@ Return ONLY valid JSON that matches this schema (no text, no markdown, no explan
 }
 """
 
-    user = f"Using this context, produce one USD/MXN M15 StrategySpec with realistic thresholds:\n{ctx}"
-    msg = client.chat.completions.create(model="gpt-4o-mini",
+DEFAULT_QUERIES = [
+    "Quarters Theory and Beat the Market Maker: entries, exits, stop hunts, session timing, quarter levels",
+    "Stop hunts and peak formations around the London and New York opens",
+    "Quarter level reactions: 00, 25, 50, 75 levels as entry and target zones",
+    "Three-day cycle, levels 1-2-3 and trend confirmation with EMAs and RSI",
+]
+
+_client = None
+
+
+def retrieve(query, k=10):
+    return "\n\n".join([m["text"] for m in get_retriever().search([query], k)[0]])
+
+
+def openai_llm(system, user, model=MODEL):
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client.chat.completions.create(model=model,
         messages=[{"role":"system","content":system},{"role":"user","content":user}]
     ).choices[0].message.content
 
-import json, re
-from pydantic import ValidationError
+
+def cached_llm(llm, system, user, model=MODEL, cache_dir=LLM_CACHE_DIR):
+    """LLM call memoized on disk by a hash of the full prompt, so reruns are free."""
+    key = hashlib.sha256(json.dumps([model, system, user]).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.txt")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    msg = llm(system, user)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(msg)
+    return msg
+
 
 def clean_and_validate(msg: str):
+    # Remove ```json or ``` wrappers if present
     clean = re.sub(r"^```(?:json)?\s*|\s*```$", "", msg.strip(), flags=re.MULTILINE)
     try:
         return StrategySpec.model_validate_json(clean)
@@ -72,9 +97,75 @@ def clean_and_validate(msg: str):
             print("Auto-fix also failed")
             raise e
 
-# Remove ```json or ``` wrappers if present
- 
-spec = clean_and_validate(msg)  # raises if invalid
-open("outputs/specs/usdmxn_from_ai.json", "w").write(spec.model_dump_json(indent=2))
-print("Wrote outputs/specs/usdmxn_from_ai.json")
-print(spec)
\ No newline at end of file
+
+def user_prompt(ctx, variant=None):
+    user = f"Using this context, produce one USD/MXN M15 StrategySpec with realistic thresholds:\n{ctx}"
+    if variant is not None:
+        user += f"\n\nThis is candidate #{variant + 1}; propose thresholds that differ from other candidates."
+    return user
+
+
+def generate_candidates(n, queries=DEFAULT_QUERIES, llm=openai_llm, workers=8, k=10,
+                        context=retrieve, cache_dir=LLM_CACHE_DIR):
+    """
+    N candidate specs from the retrieval queries (cycled), LLM calls made
+    concurrently. Candidates that fail clean_and_validate are dropped.
+    """
+    ctxs = {q: context(q, k) for q in dict.fromkeys(queries[i % len(queries)] for i in range(n))}
+
+    def one(i):
+        q = queries[i % len(queries)]
+        try:
+            return clean_and_validate(cached_llm(llm, SYSTEM, user_prompt(ctxs[q], i), cache_dir=cache_dir))
+        except Exception as e:
+            print(f"Candidate {i} rejected: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(workers, n)) as ex:
+        return [s for s in ex.map(one, range(n)) if s is not None]
+
+
+def rank_candidates(specs, bars_path=BARS_PATH, workers=None, rank_by="TotalReturn"):
+    """Backtest every spec in worker processes; best first. Specs that can't run rank last."""
+    from backtest import init_worker, backtest_spec_json
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(bars_path,)) as ex:
+        results = list(ex.map(backtest_spec_json, [s.model_dump_json() for s in specs]))
+    ranked = [(k, s) for k, s in zip(results, specs)]
+    ranked.sort(key=lambda ks: float("-inf") if ks[0] is None else ks[0][rank_by], reverse=True)
+    return ranked
+
+
+def write_spec(spec, path=SPEC_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(spec.model_dump_json(indent=2))
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate StrategySpec JSON from the knowledge base.")
+    ap.add_argument("--batch", type=int, default=0, help="Generate N candidates, backtest and promote the best")
+    ap.add_argument("--bars", default=BARS_PATH)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--rank-by", default="TotalReturn", choices=["TotalReturn", "Sharpe-ish", "MaxDD"])
+    args = ap.parse_args()
+
+    if not args.batch:
+        spec = clean_and_validate(cached_llm(openai_llm, SYSTEM, user_prompt(retrieve(DEFAULT_QUERIES[0]))))  # raises if invalid
+        write_spec(spec)
+        print(f"Wrote {SPEC_PATH}")
+        print(spec)
+    else:
+        specs = generate_candidates(args.batch)
+        if not specs:
+            raise SystemExit("No valid candidates.")
+        ranked = rank_candidates(specs, args.bars, args.workers, args.rank_by)
+        board = [{"name": s.name, "kpis": k} for k, s in ranked]
+        with open("outputs/specs/candidates.json", "w", encoding="utf-8") as f:
+            json.dump(board, f, indent=2)
+        best_kpis, best = ranked[0]
+        if best_kpis is None:
+            raise SystemExit("No candidate could be backtested; spec file left unchanged.")
+        write_spec(best)
+        print(json.dumps(board, indent=2))
+        print(f"Promoted '{best.name}' ({args.rank_by}={best_kpis[args.rank_by]:.4f}) to {SPEC_PATH}")
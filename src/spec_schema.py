@@ -20,6 +20,22 @@ class RiskRule(BaseModel):
     fixed_fraction: float = 0.01
     max_positions: int = 1
 
+class ScoringRule(BaseModel):
+    # points per confluence component (defaults reproduce the old 40/20/20/20 score)
+    sweep: float = 40
+    quarter: float = 20
+    rsi_extreme: float = 20
+    ema_trend: float = 20
+    h1_slope: float = 0
+    atr_band: float = 0
+    # thresholds
+    quarter_max_pips: float = 6
+    rsi_low: float = 30
+    rsi_high: float = 70
+    atr_min_pips: float = 5
+    atr_max_pips: float = 40
+    min_score: float = 0         # backtests drop entries scoring below this
+
 class StrategySpec(BaseModel):
     name: str
     timeframe: Literal["M5","M15","H1","H4","D1"]
@@ -28,3 +44,4 @@ class StrategySpec(BaseModel):
     entries: List[EntryRule]
     exits: List[ExitRule]
     risk: RiskRule
+    scoring: Optional[ScoringRule] = None
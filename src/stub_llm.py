@@ -0,0 +1,84 @@
+# src/stub_llm.py
+"""
+Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint, for
+offline tests. Replies are produced by `reply_fn(messages)` (echo by default),
+streamed word by word as SSE when the request asks for stream=True.
+
+    server = StubLLMServer().start()
+    client = OpenAI(base_url=server.url, api_key="stub")
+"""
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def echo_reply(messages):
+    last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return f"Echo: {last}"
+
+
+class StubLLMServer:
+    def __init__(self, reply_fn=echo_reply, delay=0.0, host="127.0.0.1", port=0):
+        self.reply_fn = reply_fn
+        self.delay = delay          # seconds per streamed token
+        self.requests = []          # request bodies, for assertions
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+                text = stub.reply_fn(body["messages"])
+                words = text.split(" ")
+                usage = {"prompt_tokens": sum(len(m["content"].split()) for m in body["messages"]),
+                         "completion_tokens": len(words), "total_tokens": 0}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                base = {"id": "stub-1", "created": int(time.time()), "model": body["model"]}
+
+                if not body.get("stream"):
+                    self._send_json({**base, "object": "chat.completion", "usage": usage, "choices": [
+                        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i, w in enumerate(words):
+                    time.sleep(stub.delay)
+                    piece = w if i == 0 else " " + w
+                    self._event({**base, "object": "chat.completion.chunk", "choices": [
+                        {"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+                self._event({**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def _event(self, obj):
+                self.wfile.write(f"data: {json.dumps(obj)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_json(self, obj):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
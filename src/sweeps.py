@@ -0,0 +1,219 @@
+# src/sweeps.py
+"""
+Stop-hunt (sweep) detection at several horizons in one pass.
+
+A high sweep at bar i: High[i] pokes above a reference high by more than the
+pad, and Close[i] is back below that reference (lows mirrored). References:
+- rolling extremes of the previous `lookback` bars, for every lookback x pad
+- anchored levels: previous session's range, previous day, previous 3 days
+
+Each (reference, pad) pair is one bit of SweepHiBits / SweepLoBits (int32),
+see sweep_bit_names(). SweepHi / SweepLo (0/1) keep the old lookback=20,
+pad=5 meaning for existing rules and scoring.
+"""
+from collections import deque
+import numpy as np
+import pandas as pd
+
+LOOKBACKS = (20, 50, 96)            # ~5h, ~12h, one day of M15 bars
+PADS      = (5, 10)                 # pips
+ANCHORS   = ("prev_session", "prev_day", "prev_3day")
+PIP_SCALE = 1e-4
+
+
+def sweep_bit_names(lookbacks=LOOKBACKS, pads=PADS, anchors=ANCHORS):
+    """Bit order of the flag columns: every lookback x pad, then every anchor (at pads[0])."""
+    return [f"lb{lb}_p{p}" for lb in lookbacks for p in pads] + list(anchors)
+
+
+def bit(name, lookbacks=LOOKBACKS, pads=PADS, anchors=ANCHORS):
+    """Mask for one named reference, e.g. df["SweepHiBits"] & bit("prev_day")."""
+    return 1 << sweep_bit_names(lookbacks, pads, anchors).index(name)
+
+
+# ---- O(n) rolling extremes ----
+def rolling_max(x, w):
+    """
+    max(x[i-w+1..i]) for every i (NaN until w values), like Series.rolling(w).max().
+    van Herk/Gil-Werman: per-block prefix and suffix maxima, ~3 comparisons per
+    element regardless of w, fully vectorized.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if w < 1 or n < w:
+        return out
+    m = -(-n // w) * w
+    blocks = np.pad(x, (0, m - n), constant_values=-np.inf).reshape(-1, w)
+    pre = np.maximum.accumulate(blocks, axis=1).ravel()
+    suf = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    i = np.arange(w - 1, n)
+    out[w - 1:] = np.maximum(suf[i - w + 1], pre[i])
+    return out
+
+
+def rolling_min(x, w):
+    return -rolling_max(-np.asarray(x, dtype=float), w)
+
+
+def _prior(a):
+    """a shifted one bar forward: the reference for bar i excludes bar i."""
+    return np.r_[np.nan, a[:-1]]
+
+
+def _session_refs(df):
+    """High/low of the previous Session run (e.g. London bars see the Asia range)."""
+    s = df["Session"].astype(str).to_numpy()
+    run = np.r_[0, np.cumsum(s[1:] != s[:-1])]
+    hi = pd.Series(df["High"].to_numpy()).groupby(run).max().to_numpy()
+    lo = pd.Series(df["Low"].to_numpy()).groupby(run).min().to_numpy()
+    prev_hi, prev_lo = np.r_[np.nan, hi[:-1]], np.r_[np.nan, lo[:-1]]
+    return prev_hi[run], prev_lo[run]
+
+
+def _day_refs(df, days):
+    """High/low of the previous `days` UTC dates present in the data."""
+    idx = df.index.tz_convert("UTC") if df.index.tz is not None else df.index
+    day = idx.normalize()
+    codes, _ = pd.factorize(day)
+    hi = pd.Series(df["High"].to_numpy()).groupby(codes).max()
+    lo = pd.Series(df["Low"].to_numpy()).groupby(codes).min()
+    hi = hi.rolling(days, min_periods=days).max().shift(1).to_numpy()
+    lo = lo.rolling(days, min_periods=days).min().shift(1).to_numpy()
+    return hi[codes], lo[codes]
+
+
+def sweep_bits(df, lookbacks=LOOKBACKS, pads=PADS, anchors=ANCHORS, pip_scale=PIP_SCALE):
+    """(hi_bits, lo_bits) int32 arrays, one bit per sweep_bit_names() entry."""
+    high = df["High"].to_numpy(dtype=float)
+    low = df["Low"].to_numpy(dtype=float)
+    close = df["Close"].to_numpy(dtype=float)
+    hi_bits = np.zeros(len(df), dtype=np.int32)
+    lo_bits = np.zeros(len(df), dtype=np.int32)
+
+    refs = []
+    for lb in lookbacks:
+        hh, ll = _prior(rolling_max(high, lb)), _prior(rolling_min(low, lb))
+        refs += [(hh, ll, p) for p in pads]
+    for a in anchors:
+        if a == "prev_session":
+            hh, ll = _session_refs(df) if "Session" in df.columns else (np.full(len(df), np.nan),) * 2
+        elif a == "prev_day":
+            hh, ll = _day_refs(df, 1)
+        elif a == "prev_3day":
+            hh, ll = _day_refs(df, 3)
+        else:
+            raise ValueError(f"Unknown sweep anchor: {a}")
+        refs.append((hh, ll, pads[0]))
+
+    for b, (hh, ll, pad) in enumerate(refs):
+        p = pad * pip_scale
+        with np.errstate(invalid="ignore"):
+            hi_bits |= ((high > hh + p) & (close < hh)).astype(np.int32) << b
+            lo_bits |= ((low < ll - p) & (close > ll)).astype(np.int32) << b
+    return hi_bits, lo_bits
+
+
+def add_sweeps(df, lookbacks=LOOKBACKS, pads=PADS, anchors=ANCHORS, pip_scale=PIP_SCALE,
+               base_lookback=20, base_pad=5):
+    """
+    Adds SweepHiBits/SweepLoBits plus the classic SweepHi/SweepLo for
+    (base_lookback, base_pad), which are added to the grid if missing.
+    """
+    lookbacks = tuple(dict.fromkeys((*lookbacks, base_lookback)))
+    pads = tuple(dict.fromkeys((*pads, base_pad)))
+    hi, lo = sweep_bits(df, lookbacks, pads, anchors, pip_scale)
+    b = bit(f"lb{base_lookback}_p{base_pad}", lookbacks, pads, anchors)
+    df["SweepHiBits"] = hi
+    df["SweepLoBits"] = lo
+    df["SweepHi"] = ((hi & b) != 0).astype(int)
+    df["SweepLo"] = ((lo & b) != 0).astype(int)
+    return df
+
+
+class SweepTracker:
+    """
+    Live version of sweep_bits(): update() one bar at a time, O(1) amortized.
+    Rolling extremes use monotonic deques (indices with decreasing highs /
+    increasing lows); anchors keep the running and previous session/day ranges.
+    Gives the same bits as the batch function on the same bars.
+    """
+
+    def __init__(self, lookbacks=LOOKBACKS, pads=PADS, anchors=ANCHORS, pip_scale=PIP_SCALE):
+        self.lookbacks, self.pads, self.anchors = tuple(lookbacks), tuple(pads), tuple(anchors)
+        self.pip_scale = pip_scale
+        self.i = 0
+        self._hi = {lb: deque() for lb in self.lookbacks}   # (i, high), highs decreasing
+        self._lo = {lb: deque() for lb in self.lookbacks}   # (i, low), lows increasing
+        self._sess = None                 # current session label
+        self._sess_rng = None             # [hi, lo] of the running session
+        self._prev_sess = (np.nan, np.nan)
+        self._day = None
+        self._day_rng = None
+        self._days = deque(maxlen=3)      # completed days' (hi, lo), newest last
+
+    def _refs(self):
+        refs = []
+        for lb in self.lookbacks:
+            hq, lq = self._hi[lb], self._lo[lb]
+            full = self.i >= lb
+            hh = hq[0][1] if full else np.nan
+            ll = lq[0][1] if full else np.nan
+            refs += [(hh, ll, p) for p in self.pads]
+        for a in self.anchors:
+            if a == "prev_session":
+                hh, ll = self._prev_sess
+            elif a == "prev_day":
+                hh, ll = self._days[-1] if self._days else (np.nan, np.nan)
+            else:
+                full = len(self._days) == 3
+                hh = max(d[0] for d in self._days) if full else np.nan
+                ll = min(d[1] for d in self._days) if full else np.nan
+            refs.append((hh, ll, self.pads[0]))
+        return refs
+
+    def update(self, high, low, close, ts=None, session=None):
+        """Feed one bar; returns (hi_bits, lo_bits) for it."""
+        # roll anchors over before evaluating this bar
+        if session is not None and session != self._sess:
+            if self._sess_rng is not None:
+                self._prev_sess = tuple(self._sess_rng)
+            self._sess, self._sess_rng = session, None
+        if ts is not None:
+            t = pd.Timestamp(ts)
+            day = (t.tz_convert("UTC") if t.tz else t).normalize()
+            if day != self._day:
+                if self._day_rng is not None:
+                    self._days.append(tuple(self._day_rng))
+                self._day, self._day_rng = day, None
+
+        hi_bits = lo_bits = 0
+        for b, (hh, ll, pad) in enumerate(self._refs()):
+            p = pad * self.pip_scale
+            if high > hh + p and close < hh:
+                hi_bits |= 1 << b
+            if low < ll - p and close > ll:
+                lo_bits |= 1 << b
+
+        # then add this bar to the windows/ranges
+        i = self.i
+        for lb in self.lookbacks:
+            hq, lq = self._hi[lb], self._lo[lb]
+            while hq and hq[-1][1] <= high:
+                hq.pop()
+            hq.append((i, high))
+            while lq and lq[-1][1] >= low:
+                lq.pop()
+            lq.append((i, low))
+            while hq[0][0] <= i - lb:
+                hq.popleft()
+            while lq[0][0] <= i - lb:
+                lq.popleft()
+        if session is not None:
+            self._sess_rng = [high, low] if self._sess_rng is None else \
+                [max(self._sess_rng[0], high), min(self._sess_rng[1], low)]
+        if ts is not None:
+            self._day_rng = [high, low] if self._day_rng is None else \
+                [max(self._day_rng[0], high), min(self._day_rng[1], low)]
+        self.i += 1
+        return hi_bits, lo_bits
@@ -0,0 +1,94 @@
+# src/synth_market.py
+"""
+Seeded synthetic USDMXN-like bars for offline tests, replays and benchmarks.
+
+- intraday volatility follows the session (quiet Asia, busy London/NY overlap)
+- no bars from Friday 22:00 UTC to Sunday 22:00 UTC, with a gap on the reopen
+- stop-hunt sweeps injected in London/NY: a wick through the recent
+  high/low that closes back inside (what feature_lab.sweep_flags looks for)
+
+    python src/synth_market.py --days 14 --seed 1 --out data/market/USDMXN_M15_synth.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+# per-bar return stdev multiplier by UTC hour
+HOUR_VOL = np.array([0.6] * 7 + [1.4] * 5 + [1.6] * 2 + [1.3] * 3 + [0.7] * 7)
+PIP = 1e-4
+
+
+def trading_index(start, days, freq="15min"):
+    """Bar timestamps (UTC) over `days` calendar days, weekend hours removed."""
+    idx = pd.date_range(pd.Timestamp(start, tz="UTC"), periods=int(days * pd.Timedelta("1D") / pd.Timedelta(freq)),
+                        freq=freq, name="Datetime")
+    dow, hour = idx.dayofweek, idx.hour
+    closed = ((dow == 4) & (hour >= 22)) | (dow == 5) | ((dow == 6) & (hour < 22))
+    return idx[~closed]
+
+
+def generate(start="2025-01-06", days=14, freq="15min", seed=0, price=18.0, vol=0.0006,
+             sweeps_per_day=1.0, lookback=20, sweep_pips=12, gap_vol=0.004):
+    """
+    OHLCV frame indexed by UTC Datetime. Injected sweep bars are listed in
+    df.attrs["sweeps"] as (timestamp, "high"|"low").
+    """
+    rng = np.random.default_rng(seed)
+    idx = trading_index(start, days, freq)
+    n = len(idx)
+
+    rets = rng.standard_normal(n) * vol * HOUR_VOL[idx.hour]
+    # weekend gap: the first bar after a >1 bar hole jumps
+    step = pd.Timedelta(freq)
+    gaps = np.r_[False, (idx[1:] - idx[:-1]) > step]
+    rets[gaps] += rng.standard_normal(gaps.sum()) * gap_vol
+    close = price * np.exp(np.cumsum(rets))
+    open_ = np.r_[price, close[:-1]]
+    open_[gaps] = close[gaps] * np.exp(-rets[gaps] / 4)   # most of the gap happens on the open
+    wick = np.abs(rng.standard_normal((2, n))) * vol * price * HOUR_VOL[idx.hour] * 0.8
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+
+    # stop hunts: pierce the prior `lookback` extreme, close back inside
+    active = np.flatnonzero(np.isin(idx.hour, range(7, 17)))
+    active = active[active > lookback]
+    n_sweeps = min(len(active), rng.poisson(sweeps_per_day * days))
+    sweeps = []
+    for i in np.sort(rng.choice(active, n_sweeps, replace=False)):
+        if rng.random() < 0.5:
+            hh = high[i - lookback:i].max()
+            high[i] = hh + sweep_pips * PIP
+            close[i] = min(close[i], hh - PIP)
+            sweeps.append((idx[i], "high"))
+        else:
+            ll = low[i - lookback:i].min()
+            low[i] = ll - sweep_pips * PIP
+            close[i] = max(close[i], ll + PIP)
+            sweeps.append((idx[i], "low"))
+        high[i] = max(high[i], open_[i], close[i])
+        low[i] = min(low[i], open_[i], close[i])
+        if i + 1 < n:
+            open_[i + 1] = close[i]
+            high[i + 1] = max(high[i + 1], open_[i + 1])
+            low[i + 1] = min(low[i + 1], open_[i + 1])
+
+    df = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close,
+                       "Volume": rng.integers(50, 500, n) * HOUR_VOL[idx.hour].round().astype(int).clip(1)},
+                      index=idx)
+    df.attrs["sweeps"] = sweeps
+    return df
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write seeded synthetic USDMXN bars to CSV")
+    ap.add_argument("--start", default="2025-01-06")
+    ap.add_argument("--days", type=float, default=14)
+    ap.add_argument("--freq", default="15min")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--sweeps-per-day", type=float, default=1.0)
+    ap.add_argument("--out", default="data/market/USDMXN_M15_synth.csv")
+    args = ap.parse_args()
+
+    df = generate(args.start, args.days, args.freq, args.seed, sweeps_per_day=args.sweeps_per_day)
+    df.to_csv(args.out, index_label="Datetime")
+    print(f"Wrote {len(df)} bars ({len(df.attrs['sweeps'])} injected sweeps) to {args.out}")
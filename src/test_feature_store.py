@@ -0,0 +1,78 @@
+# src/test_feature_store.py
+# Offline check of the feature store: appends match a full recompute, older/middle windows leave it alone.
+import os, json, tempfile
+import numpy as np
+import pandas as pd
+from spec_schema import StrategySpec
+from synth_market import generate
+from session_calendar import add_sessions
+from signal_engine import add_features
+from feature_store import FeatureStore
+
+SPEC = StrategySpec.model_validate_json(
+    open(os.path.join(os.path.dirname(__file__), "..", "outputs", "specs", "usdmxn_quarters_bmm.json")).read())
+
+
+def bars(days=20, seed=4):
+    df = add_sessions(generate(days=days, seed=seed)[["Open", "High", "Low", "Close", "Volume"]])
+    df.attrs = {}
+    return df
+
+
+def assert_same(a, b):
+    assert a.index.equals(b.index) and list(a.columns) == list(b.columns)
+    for c in a.columns:
+        if isinstance(a[c].dtype, pd.CategoricalDtype):
+            assert (a[c].astype(str) == b[c].astype(str)).all(), c
+        else:
+            np.testing.assert_allclose(a[c].to_numpy(float), b[c].to_numpy(float), rtol=1e-9, atol=1e-12,
+                                       err_msg=c)
+
+
+def test_append_matches_full_recompute():
+    df = bars()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeatureStore(SPEC, root=tmp)
+        store.update(df.iloc[:-50])
+        for i in range(len(df) - 49, len(df) + 1, 7):
+            store.update(df.iloc[max(0, i - 672):i])
+        store.update(df.iloc[-672:])
+        assert_same(store.frame(), add_features(df, SPEC))
+
+
+def test_older_and_middle_windows_keep_the_store():
+    df = bars()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeatureStore(SPEC, root=tmp)
+        store.update(df.iloc[300:])
+        n = store.rows
+
+        assert store.update(df.iloc[400:800]) == 0            # middle window
+        assert store.update(df.iloc[:800]) == 0               # starts before the store, ends inside it
+        assert store.rows == n
+        assert store.update(df.iloc[300:]) == 0               # nothing to redo afterwards
+
+        older = store.features_for(df.iloc[:800])             # not in the store: computed directly
+        assert_same(older, add_features(df.iloc[:800], SPEC))
+        middle = store.features_for(df.iloc[400:800])
+        assert middle.index.equals(df.index[400:800])
+        assert store.rows == n
+
+
+def test_revised_bar_rewinds_only_from_there():
+    df = bars()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeatureStore(SPEC, root=tmp)
+        store.update(df)
+        rev = df.iloc[:-10].copy()
+        rev.iloc[-1, rev.columns.get_loc("Close")] += 0.01
+        assert store.update(rev) > 0
+        assert store.rows == len(rev)
+        assert_same(store.frame(), add_features(rev, SPEC))
+
+
+if __name__ == "__main__":
+    test_append_matches_full_recompute()
+    test_older_and_middle_windows_keep_the_store()
+    test_revised_bar_rewinds_only_from_there()
+    print("✅ feature store checks passed")
@@ -0,0 +1,52 @@
+# src/test_llm_cache.py
+# Offline check of the chat reply cache + streaming against the local stub endpoint.
+import time
+from openai import OpenAI
+from stub_llm import StubLLMServer
+from llm_cache import ResponseCache, UsageLog, cache_key, stream_chat
+
+
+def test_stream_then_cache_hit():
+    server = StubLLMServer(delay=0.01).start()
+    try:
+        client = OpenAI(base_url=server.url, api_key="stub")
+        cache, usage = ResponseCache(), UsageLog()
+        msgs = [{"role": "system", "content": "kb"}, {"role": "user", "content": "what is the bias today"}]
+        key = cache_key("gpt-4o-mini", msgs, "kb", "snap")
+
+        pieces = list(stream_chat(client, "gpt-4o-mini", msgs, cache, key, usage))
+        assert len(pieces) > 1                      # streamed, not one blob
+        assert "".join(pieces) == "Echo: what is the bias today"
+
+        again = list(stream_chat(client, "gpt-4o-mini", msgs, cache, key, usage))
+        assert again == ["Echo: what is the bias today"]
+        assert len(server.requests) == 1            # second answer never hit the endpoint
+
+        first, second = usage.records
+        assert not first["cached"] and second["cached"]
+        assert first["completion_tokens"] == 6 and first["prompt_tokens"] > 0
+        assert first["first_token_ms"] < first["total_ms"]
+    finally:
+        server.stop()
+
+
+def test_key_changes_with_context():
+    msgs = [{"role": "user", "content": "hi"}]
+    assert cache_key("m", msgs, "kb1", "s") != cache_key("m", msgs, "kb2", "s")
+    assert cache_key("m", msgs, "kb1", "s") != cache_key("m", msgs, "kb1", "s2")
+    assert cache_key("m", msgs, "kb1", "s") == cache_key("m", list(msgs), "kb1", "s")
+
+
+def test_ttl_and_size_limits():
+    cache = ResponseCache(ttl=0.05, max_entries=2)
+    cache.put("a", "1"); cache.put("b", "2"); cache.put("c", "3")
+    assert cache.get("a") is None and cache.get("c") == "3"
+    time.sleep(0.06)
+    assert cache.get("c") is None
+
+
+if __name__ == "__main__":
+    test_stream_then_cache_hit()
+    test_key_changes_with_context()
+    test_ttl_and_size_limits()
+    print("✅ llm cache checks passed")
@@ -0,0 +1,59 @@
+# src/test_spec_batch.py
+# Offline check of batch spec generation: stub LLM, synthetic bars, parallel backtests.
+import os, json, re, tempfile
+import numpy as np
+import pandas as pd
+from spec_from_docs import generate_candidates, rank_candidates, write_spec
+
+SPEC = json.load(open(os.path.join(os.path.dirname(__file__), "..", "outputs", "specs", "usdmxn_quarters_bmm.json")))
+
+
+def stub_llm(system, user):
+    """Candidate i loosens the RSI threshold by i points; candidate 3 returns junk."""
+    i = int(re.search(r"candidate #(\d+)", user).group(1)) - 1
+    if i == 3:
+        return "sorry, I can't help with that"
+    spec = json.loads(json.dumps(SPEC))
+    spec["name"] = f"stub-{i}"
+    spec["entries"][0]["condition"] = spec["entries"][0]["condition"].replace("45", str(45 + 5 * i))
+    return "```json\n" + json.dumps(spec) + "\n```"
+
+
+def synthetic_bars(path, n=1500, seed=3):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2025-09-01", periods=n, freq="15min", tz="UTC")
+    close = 18.4 + np.cumsum(rng.normal(0, 0.004, n))
+    high = close + rng.uniform(0, 0.01, n)
+    low = close - rng.uniform(0, 0.01, n)
+    pd.DataFrame({"Open": np.r_[close[0], close[:-1]], "High": high, "Low": low, "Close": close, "Volume": 0},
+                 index=pd.Index(idx, name="Datetime")).to_csv(path)
+
+
+def test_batch_generate_rank_promote():
+    with tempfile.TemporaryDirectory() as tmp:
+        bars, cache = os.path.join(tmp, "bars.csv"), os.path.join(tmp, "llm")
+        synthetic_bars(bars)
+        calls = []
+        llm = lambda s, u: calls.append(u) or stub_llm(s, u)
+        ctx = lambda q, k: f"context for {q}"
+
+        specs = generate_candidates(5, llm=llm, context=ctx, cache_dir=cache)
+        assert [s.name for s in specs] == ["stub-0", "stub-1", "stub-2", "stub-4"]   # junk rejected
+        assert len(calls) == 5
+
+        assert len(generate_candidates(5, llm=llm, context=ctx, cache_dir=cache)) == 4
+        assert len(calls) == 5                      # rerun served from the prompt cache
+
+        ranked = rank_candidates(specs, bars, workers=2)
+        assert all(k is not None for k, _ in ranked)
+        returns = [k["TotalReturn"] for k, _ in ranked]
+        assert returns == sorted(returns, reverse=True)
+
+        out = os.path.join(tmp, "best.json")
+        write_spec(ranked[0][1], out)
+        assert json.load(open(out))["name"] == ranked[0][1].name
+
+
+if __name__ == "__main__":
+    test_batch_generate_rank_promote()
+    print("✅ batch spec checks passed")
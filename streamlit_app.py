@@ -1,25 +1,35 @@
 # streamlit_app.py
+import io, os, sys
 import streamlit as st
 import pandas as pd
-from src.sentiment import market_sentiment
-from src.chart_export import export_trade_chart
+# src/ modules import each other flat (as when run from src/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from sentiment import market_sentiment
+from dashboard_data import SignalFeed
+from chart_export import export_trade_chart
+from event_journal import JournalReader, LiveFrame
 from openai import OpenAI
-import os
-from src.utils_rag import retrieve_from_vector_db
+from utils_rag import retrieve_from_vector_db
+from retriever import get_retriever
+from llm_cache import cache_key, stream_chat, get_cache
 import dotenv
 dotenv.load_dotenv(override=True)
 
 # Load API key (make sure it's in your .env)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
-# Load last week's signals
-df = pd.read_csv("outputs/signals/usdmxn_signals_with_trades.csv",parse_dates=["Datetime"])
-df = df.set_index("Datetime")
+# Load last week's signals (memoized per file version, appends read incrementally)
+@st.cache_resource
+def signal_feed():
+    return SignalFeed("outputs/signals/usdmxn_signals_with_trades.csv")
+
+feed = signal_feed()
+df = feed.load()
 st.title("📊 USDMXN BTMM + Quarters Dashboard")
 
 # --- Weekly Stats ---
 st.subheader("Weekly Signal Summary")
-weekly = df.last("7D")
+weekly = feed.memo("weekly", lambda d: d.iloc[d.index.searchsorted(d.index[-1] - pd.Timedelta("7D"), side="right"):])
 st.metric("Total Trades", len(weekly[weekly["Signal"].isin(["BUY","SELL"])]))
 st.metric("Buys", len(weekly[weekly["Signal"]=="BUY"]))
 st.metric("Sells", len(weekly[weekly["Signal"]=="SELL"]))
@@ -28,15 +38,64 @@ st.dataframe(weekly[["Signal","Session","Close","RSI_14","EMA_50","QG"]].tail(20
 
 # --- Market Sentiment ---
 st.subheader("Market Sentiment Analysis")
-sent = market_sentiment(df)
+sent_hist = feed.sentiment_history()
+sent = market_sentiment(df, series=sent_hist)
 for k,v in sent.items():
     st.write(f"**{k}**: {v}")
+st.caption("PF (0 none, 1 PFH, 2 PFL) · Level (2/3) · Bias (0 neutral, 1 bearish, 2 bullish)")
+st.line_chart(sent_hist[["PF","Level","Bias"]].tail(300))
 
 # --- Chart ---
 st.subheader("Recent Chart with Trades")
-chart_path = export_trade_chart(df, "outputs/alerts/streamlit_chart.png", sentiment=sent)
+chart_path = feed.chart("outputs/alerts/streamlit_chart.png", sentiment=sent)
 st.image(chart_path, caption="Last 300 bars with signals & sentiment")
 
+# full-history zoom: any range is downsampled to the image width, trade markers kept
+# (only the last few ranges are kept, keyed on the data version)
+@st.cache_data(max_entries=8, show_spinner=False)
+def zoom_png(version, lo, hi, _df, _sent):
+    return export_trade_chart(_df.loc[lo:hi], io.BytesIO(), sentiment=_sent, bars=None).getvalue()
+
+with st.expander("Zoom out (full history)"):
+    t0, t1 = df.index[0].to_pydatetime(), df.index[-1].to_pydatetime()
+    lo, hi = st.slider("Date range", min_value=t0, max_value=t1, value=(t0, t1), format="YYYY-MM-DD")
+    if df.loc[lo:hi].empty:
+        st.caption("No bars in that range.")
+    else:
+        st.image(zoom_png(feed.version, lo, hi, df, sent),
+                 caption=f"{lo:%Y-%m-%d} → {hi:%Y-%m-%d}, min/max downsampled")
+
+# --- Live feed ---
+# The pipeline appends bars/signals/alerts to a local journal; this fragment
+# tails it every second and applies only the new events (no page rerun).
+@st.cache_resource
+def live_feed():
+    return JournalReader(), LiveFrame(max_bars=2000)
+
+@st.fragment(run_every="1s")
+def live_panel():
+    reader, live = live_feed()
+    live.apply(reader.poll())
+    if live.df.empty:
+        st.caption("Waiting for events from the signal pipeline…")
+        return
+    last = live.df.iloc[-1]
+    lag = live.lag_s()
+    st.caption(f"Last bar {live.df.index[-1]:%Y-%m-%d %H:%M} UTC · {len(live.df)} bars in memory · "
+               f"last event {lag:.0f}s ago")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Close", f"{last['Close']:.5f}")
+    c2.metric("Signal", last.get("Signal", "FLAT"))
+    c3.metric("Score", last.get("Score", 0))
+    st.line_chart(live.df["Close"].tail(300))
+    if live.signals:
+        st.dataframe(pd.DataFrame(list(live.signals)[::-1]).head(10))
+    for a in list(live.alerts)[-3:][::-1]:
+        st.info(f"🔔 {a['subject']}")
+
+st.subheader("Live Feed")
+live_panel()
+
 # --- Narrative Breakdown ---
 st.subheader("AI Breakdown")
 desc = (
@@ -71,8 +130,10 @@ if prompt := st.chat_input("Ask about USD/MXN, signals, or BTMM strategy..."):
     except:
         context = "No recent market data loaded."
 
-    # 📚 Context: retrieved knowledge
+    # 📚 Context: retrieved knowledge (warm retriever, loaded once per process)
     kb_context = "\n\n".join(retrieve_from_vector_db(prompt, k=5))
+    rs = get_retriever().stats()
+    st.sidebar.caption(f"KB retrieval: {rs['queries']} queries · p50 {rs['p50_ms']:.0f} ms · p99 {rs['p99_ms']:.0f} ms · cache hits {rs['cache_hits']}")
 
     # 🔗 Combined context
     system_context = (
@@ -80,20 +141,25 @@ if prompt := st.chat_input("Ask about USD/MXN, signals, or BTMM strategy..."):
         "Ground your answers in provided knowledge and recent data."
     )
 
+    model = "gpt-4o-mini"
+    messages = [
+        {"role":"system", "content": system_context},
+        {"role":"system", "content": f"Knowledge base:\n{kb_context}"},
+        {"role":"system", "content": f"Market data:\n{context}"},
+        *st.session_state.messages
+    ]
+    reply_cache, usage = get_cache()
+    key = cache_key(model, st.session_state.messages, kb_context, context)
+
     with st.chat_message("assistant"):
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role":"system", "content": system_context},
-                    {"role":"system", "content": f"Knowledge base:\n{kb_context}"},
-                    {"role":"system", "content": f"Market data:\n{context}"},
-                    *st.session_state.messages
-                ]
-            )
-            reply = response.choices[0].message.content
+            # tokens render as they arrive; repeated questions come from the cache
+            reply = st.write_stream(stream_chat(client, model, messages, reply_cache, key, usage))
         except Exception as e:
             reply = f"⚠️ Error: {e}"
-
-        st.markdown(reply)
-    st.session_state.messages.append({"role":"assistant","content":reply})
\ No newline at end of file
+            st.markdown(reply)
+    st.session_state.messages.append({"role":"assistant","content":reply})
+    u = usage.summary()
+    st.sidebar.caption(f"LLM: {u['requests']} requests ({u['cached']} cached) · "
+                       f"{u['prompt_tokens']}+{u['completion_tokens']} tokens · "
+                       f"first token {u['avg_first_token_ms']} ms · total {u['avg_total_ms']} ms")
\ No newline at end of file